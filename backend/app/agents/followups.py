@@ -0,0 +1,105 @@
+import os
+import re
+from app.agents.narration import parse_result
+
+# Follow-up turns reuse the previous turn's schema context when it still covers the
+# question; SESSION_REUSE_CONTEXT=false always re-runs retrieval (prior SQL is still sent)
+REUSE_CONTEXT = os.getenv("SESSION_REUSE_CONTEXT", "true").lower() in ("1", "true", "yes")
+DIGEST_MAX_CHARS = int(os.getenv("SESSION_DIGEST_MAX_CHARS", "500"))
+DIGEST_SAMPLE_ROWS = 3
+
+# Words that shape a follow-up ("now break that down by ...") without naming data.
+# Anything else in the question should be findable in the schema context.
+FOLLOWUP_WORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "in", "on", "at", "to", "for", "from", "with", "without",
+    "by", "per", "each", "every", "into", "than", "then", "now", "also", "just", "only", "instead",
+    "same", "that", "this", "these", "those", "them", "it", "its", "they", "their", "there", "what",
+    "which", "who", "how", "many", "much", "me", "show", "give", "list", "get", "find", "break", "down",
+    "split", "group", "grouped", "sort", "sorted", "order", "ordered", "filter", "filtered", "limit",
+    "exclude", "include", "top", "bottom", "first", "last", "most", "least", "more", "less",
+    "highest", "lowest", "total", "sum", "average", "avg", "count", "number", "max", "min", "maximum",
+    "minimum", "ascending", "descending", "asc", "desc", "again", "please", "can", "you", "do",
+    "does", "is", "are", "was", "were", "be", "as", "well", "all", "any", "some", "not", "no", "rather",
+    "day", "days", "week", "weeks", "month", "months", "year", "years", "daily", "weekly", "monthly",
+    "yearly", "quarter", "quarterly", "over", "time", "result", "results", "query", "one", "two", "three",
+}
+WORD = re.compile(r"[a-z][a-z0-9_]*")
+
+
+def result_digest(query_result) -> str:
+    """
+    Short description of a result (columns, row count, a few rows) kept in the session
+    so the next turn knows what the user saw without storing the full result.
+    """
+    rows = parse_result(query_result)
+    if rows is None:
+        return str(query_result)[:DIGEST_MAX_CHARS]
+    if not rows:
+        return "No rows."
+    columns = ", ".join(rows[0].keys())
+    digest = f"{len(rows)} row(s); columns: {columns}; first rows: {rows[:DIGEST_SAMPLE_ROWS]}"
+    return digest[:DIGEST_MAX_CHARS]
+
+
+def _vocabulary(schema_context: str) -> set:
+    words = set(WORD.findall(schema_context.lower()))
+    # customer_id also covers "customer"
+    for word in list(words):
+        words.update(part for part in word.split("_") if part)
+    return words
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def context_covers(question: str, schema_context: str) -> bool:
+    """
+    True if every data word in the follow-up (anything that isn't phrasing, see
+    FOLLOWUP_WORDS) appears among the table/column names and text of the context.
+    A new entity ("...by region" when no region column was retrieved) means retrieval has to run.
+    """
+    if not REUSE_CONTEXT or not schema_context:
+        return False
+    vocabulary = _vocabulary(schema_context)
+    for word in WORD.findall(question.lower()):
+        if word in FOLLOWUP_WORDS:
+            continue
+        if word not in vocabulary and _singular(word) not in vocabulary:
+            return False
+    return True
+
+
+def merge_contexts(previous: str, retrieved: str) -> str:
+    """
+    Previous tables first (the prior SQL uses them), then newly retrieved ones, without duplicates.
+    """
+    blocks, seen = [], set()
+    for context in (previous, retrieved):
+        for block in re.split(r"\n\n(?=Table: )", context or ""):
+            if block.strip() and block not in seen:
+                seen.add(block)
+                blocks.append(block)
+    return "\n\n".join(blocks)
+
+
+def followup_prompt(question: str, context: str, history: dict) -> str:
+    """
+    Generator prompt for a follow-up: the previous turn's SQL is the starting point to edit.
+    """
+    return f"""
+        This is a follow-up to a previous question in the same conversation.
+        Previous Question: {history.get("question", "")}
+        Previous SQL: {history.get("sql_query", "")}
+        Previous Result: {history.get("result_digest", "")}
+
+        Follow-up Question: {question}
+        Context: {context}
+
+        Modify the previous SQL as little as needed to answer the follow-up question.
+        Output valid PostgreSQL only.
+        """
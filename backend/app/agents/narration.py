@@ -0,0 +1,89 @@
+import os
+import ast
+import math
+from typing import Optional
+
+# Template narration answers trivially-shaped results without an LLM round trip.
+# NARRATOR_TEMPLATES=false sends everything to the LLM; results with more rows
+# (or more columns) than the limits below always go to the LLM.
+TEMPLATES_ENABLED = os.getenv("NARRATOR_TEMPLATES", "true").lower() in ("1", "true", "yes")
+TEMPLATE_MAX_ROWS = int(os.getenv("NARRATOR_TEMPLATE_MAX_ROWS", "5"))
+TEMPLATE_MAX_COLUMNS = int(os.getenv("NARRATOR_TEMPLATE_MAX_COLUMNS", "4"))
+
+
+def parse_result(query_result) -> Optional[list]:
+    """
+    Turns the executor's string output back into a list of row dicts.
+    Returns None for database errors or anything that doesn't parse.
+    """
+    if isinstance(query_result, list):
+        return query_result
+    if not isinstance(query_result, str) or query_result.startswith(("Error", "Database Error")):
+        return None
+    try:
+        rows = ast.literal_eval(query_result)
+    except (ValueError, SyntaxError):
+        return None
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        return None
+    return rows
+
+
+def _label(column: str) -> str:
+    return column.replace("_", " ").strip() or "value"
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "not available"
+    if isinstance(value, float):
+        # Two decimals for amounts; significant digits for small ratios and averages,
+        # which would otherwise round to 0
+        if not 0 < abs(value) < 1:
+            return f"{value:,.2f}".rstrip("0").rstrip(".")
+        decimals = 3 - math.floor(math.log10(abs(value)))  # 4 significant digits, no exponent
+        return f"{value:.{decimals}f}".rstrip("0").rstrip(".")
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return str(value)
+
+
+def _format_row(row: dict) -> str:
+    return ", ".join(f"{_label(k)}: {_format_value(v)}" for k, v in row.items())
+
+
+def result_shape(rows: list) -> str:
+    if not rows:
+        return "empty"
+    if len(rows) == 1:
+        return "scalar" if len(rows[0]) == 1 else "single_row"
+    return "top_n"
+
+
+def template_narration(query_result) -> Optional[tuple]:
+    """
+    Returns (shape, answer) for scalar, single-row, empty and small top-N results,
+    or None when the result should be narrated by the LLM.
+    """
+    if not TEMPLATES_ENABLED:
+        return None
+
+    rows = parse_result(query_result)
+    if rows is None:
+        return None
+    if len(rows) > TEMPLATE_MAX_ROWS or any(len(r) > TEMPLATE_MAX_COLUMNS for r in rows):
+        return None
+
+    shape = result_shape(rows)
+    if shape == "empty":
+        return shape, "No matching records were found for your question."
+
+    if shape == "scalar":
+        column, value = next(iter(rows[0].items()))
+        return shape, f"The {_label(column)} is {_format_value(value)}."
+
+    if shape == "single_row":
+        return shape, f"Here is the result: {_format_row(rows[0])}."
+
+    lines = "\n".join(f"{i}. {_format_row(row)}" for i, row in enumerate(rows, start=1))
+    return shape, f"Found {len(rows)} results:\n{lines}"
@@ -1,15 +1,18 @@
 from app.agents.state import AgentState
-from app.services.llm import get_llm
+from app.services.llm import get_narrator_llm
+from app.services.metrics import metrics
+from app.agents.router import route_generation, get_tier_llm, remember_cache_outcome
+from app.agents.narration import template_narration
 from langchain_core.messages import SystemMessage, HumanMessage
-from app.services.rag import VectorService
-import sqlglot
-from sqlglot import exp
+from app.services.rag import get_vector_service
+from app.agents.sql_checks import check_sql
+from app.agents.speculative import candidate_fan_out, generate_candidates
+from app.agents.followups import context_covers, merge_contexts, followup_prompt
 import os
-from app.services.database import execute_query
+from app.services.database import execute_cached_query
 
-# Initialize LLM and RAG
-llm = get_llm()
-rag = VectorService()
+# RAG and LLM clients are created lazily on first use (or by the warmup task),
+# so importing this module stays cheap
 
 def planner_node(state: AgentState):
     """
@@ -19,9 +22,25 @@ def planner_node(state: AgentState):
     print("--- PLANNER NODE (Retrieving Schema) ---")
     question = state['question']
     
+    # Batch requests retrieve schema for all questions up front (one batched encode)
+    if state.get("schema_context"):
+        return {"schema_context": state["schema_context"]}
+    
+    # Follow-ups keep the previous turn's tables when they still cover the question
+    history = state.get("history") or {}
+    previous_context = history.get("schema_context", "")
+    if context_covers(question, previous_context):
+        metrics.incr("sessions.context_reused")
+        return {"schema_context": previous_context}
+    
     # RAG LOOKUP: Find relevant tables based on the user's question
     # We fetch top 3 results to ensure we cover joins (e.g., Users + Orders + Products)
-    retrieved_schema = rag.get_relevant_schema(question, n_results=3)
+    retrieved_schema = get_vector_service().get_relevant_schema(question, n_results=3)
+    
+    # A follow-up that brings in new tables still needs the ones the previous SQL used
+    if previous_context:
+        metrics.incr("sessions.context_extended")
+        retrieved_schema = merge_contexts(previous_context, retrieved_schema)
     
     # Store this real schema in the state so the Generator can use it
     return {"schema_context": retrieved_schema}
@@ -31,6 +50,7 @@ def generator_node(state: AgentState):
     question = state['question']
     context = state['schema_context']
     error = state.get("error") # Check if we are coming from a failure
+    history = state.get("history") or {}  # Previous turn, for follow-up questions
     
     if error:
         # REPAIR MODE: We include the error message in the prompt
@@ -44,6 +64,9 @@ def generator_node(state: AgentState):
         
         CORRECT your query and output valid PostgreSQL only.
         """
+    elif history.get("sql_query"):
+        # FOLLOW-UP MODE: edit the previous turn's SQL instead of starting over
+        prompt = followup_prompt(question, context, history)
     else:
         # STANDARD MODE
         prompt = f"Question: {question}\nContext: {context}"
@@ -51,37 +74,34 @@ def generator_node(state: AgentState):
     system_msg = SystemMessage(content="You are a SQL Expert. Output ONLY the SQL query for PostgreSQL.")
     human_msg = HumanMessage(content=prompt)
     
-    response = llm.invoke([system_msg, human_msg])
-    return {"sql_query": response.content}
+    # Simple questions go to the fast tier; retries escalate to the strong tier
+    tier = route_generation(state)
+    llm = get_tier_llm(tier)
+    fan_out = candidate_fan_out(llm)
+    with metrics.timer(f"router.{tier}.generation"):
+        if fan_out > 1:
+            # Speculative mode: N candidates in parallel, first valid one wins
+            sql_query = generate_candidates(llm, system_msg, prompt, fan_out)
+        else:
+            sql_query = llm.invoke([system_msg, human_msg]).content
+    return {"sql_query": sql_query, "model_tier": tier}
 
 def validator_node(state: AgentState):
     """
     Checks if the generated SQL is valid and safe.
     """
     print("--- VALIDATOR NODE ---")
-    sql_query = state['sql_query']
     
-    # 1. Clean the SQL (remove markdown backticks if LLM added them)
-    clean_query = sql_query.replace("```sql", "").replace("```", "").strip()
+    # Clean, parse and security-check the SQL (see app/agents/sql_checks.py)
+    clean_query, error = check_sql(state['sql_query'])
     
-    try:
-        # 2. Parse the SQL into an Abstract Syntax Tree (AST)
-        # This will fail if the syntax is broken (e.g. missing commas)
-        parsed = sqlglot.parse_one(clean_query)
-        
-        # 3. Security Check: Ensure it's a SELECT statement
-        # We use isinstance to check the AST node type
-        if not isinstance(parsed, exp.Select):
-            return {"error": "Security Alert: Only SELECT statements are allowed.", "retry_count": state["retry_count"] + 1}
-            
-        # If we get here, syntax is good and it's safe.
-        # We update the state with the cleaned query and clear any old errors
-        return {"sql_query": clean_query, "error": None}
-
-    except Exception as e:
-        # If sqlglot fails to parse, it's a syntax error
-        print(f"Syntax Error caught: {e}")
-        return {"error": f"SQL Syntax Error: {str(e)}", "retry_count": state["retry_count"] + 1}
+    if error:
+        print(f"Validation failed: {error}")
+        return {"error": error, "retry_count": state["retry_count"] + 1}
+    
+    # If we get here, syntax is good and it's safe.
+    # We update the state with the cleaned query and clear any old errors
+    return {"sql_query": clean_query, "error": None}
     
 def executor_node(state: AgentState):
     """
@@ -93,7 +113,11 @@ def executor_node(state: AgentState):
     # Run the query
     # If an AGENT_DATABASE_URL is provided, execute there; otherwise default DATABASE_URL is used
     agent_db_url = os.getenv("AGENT_DATABASE_URL")
-    result = execute_query(sql_query, db_url=agent_db_url)
+    # Identical (normalized) queries are answered from the result cache
+    result, cache_hit = execute_cached_query(sql_query, db_url=agent_db_url)
+    # Repeated misses for the same question feed the router's complexity score
+    if cache_hit is not None:
+        remember_cache_outcome(state['question'], cache_hit)
     
     # Save the data to the state
     return {"query_result": result}
@@ -107,6 +131,15 @@ def narrator_node(state: AgentState):
     result = state['query_result']
     sql = state['sql_query']
     
+    # Trivial shapes (scalar, single row, empty, small top-N) don't need an LLM round trip
+    templated = template_narration(result)
+    if templated:
+        shape, answer = templated
+        metrics.incr("narrator.short_circuit")
+        metrics.incr(f"narrator.short_circuit.{shape}")
+        return {"final_answer": answer}
+    metrics.incr("narrator.llm")
+    
     # Prompt the LLM to be a Data Analyst
     system_msg = SystemMessage(content="You are a data storyteller. Summarize the database results in a clear, concise way to answer the user's question. Do not mention SQL or technical details unless asked.")
     
@@ -118,7 +151,9 @@ def narrator_node(state: AgentState):
     Provide a brief summary:
     """)
     
-    response = llm.invoke([system_msg, human_msg])
+    tier = state.get("model_tier") or "strong"
+    with metrics.timer(f"router.{tier}.narration"):
+        response = get_narrator_llm(get_tier_llm(tier)).invoke([system_msg, human_msg])
     
     # Update the final answer in the state
     return {"final_answer": response.content}
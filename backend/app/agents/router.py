@@ -0,0 +1,177 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from app.services.llm import get_llm, DEFAULT_PROVIDER
+from app.services.metrics import metrics
+
+# Fast tier: a small model that handles single-table filters and counts well.
+# Strong tier: the default (big) model from LLM_PROVIDER / LLM_MODEL.
+FAST_MODELS = {
+    "groq": "llama-3.1-8b-instant",
+    "stub": "stub-sql-fast",
+    "openai": "gpt-4o-mini",
+}
+
+# Questions scoring at or above this go straight to the strong tier
+COMPLEXITY_THRESHOLD = int(os.getenv("LLM_ROUTER_THRESHOLD", "3"))
+
+# Weights (see score_question). A single-table GROUP BY stays under the threshold;
+# a join, a second referenced table, or window-style analytics pushes a question over it.
+SIMPLE_AGGREGATION_KEYWORDS = re.compile(
+    r'\b(average|avg|sum|total|count|group|grouped|per|each|by|top)\b',
+    re.IGNORECASE
+)
+SIMPLE_AGGREGATION_CAP = 2
+ANALYTIC_KEYWORDS = re.compile(
+    r'\b(breakdown|break down|rank|ranking|trend|percent|percentage|ratio|median|growth|running|cumulative)\b',
+    re.IGNORECASE
+)
+# "between" is left out on purpose: it's almost always a date or value range, not a join
+JOIN_KEYWORDS = re.compile(
+    r'\b(join|with their|along with|compared?|versus|vs|across|who have|that have|which have)\b',
+    re.IGNORECASE
+)
+TABLE_NAME = re.compile(r'^Table:\s*(\S+)', re.MULTILINE)
+
+# Questions that needed escalation before are sent straight to the strong tier next time
+MAX_REMEMBERED_QUESTIONS = 1000
+_escalated_questions = OrderedDict()
+_escalated_lock = threading.Lock()
+
+# Result-cache misses per question. A question asked again whose SQL still misses the
+# cache got different SQL each time, a sign the model finds it hard to pin down.
+CACHE_MISS_CAP = 2
+_cache_misses = OrderedDict()
+
+
+def routing_enabled() -> bool:
+    return os.getenv("LLM_ROUTING", "true").lower() in ("1", "true", "yes")
+
+
+def _question_key(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def remember_escalation(question: str):
+    with _escalated_lock:
+        key = _question_key(question)
+        _escalated_questions[key] = True
+        _escalated_questions.move_to_end(key)
+        while len(_escalated_questions) > MAX_REMEMBERED_QUESTIONS:
+            _escalated_questions.popitem(last=False)
+
+
+def remember_cache_outcome(question: str, hit: bool):
+    """
+    Called by the executor after each cacheable query. A hit means the question's SQL
+    is stable, so its miss count is forgotten.
+    """
+    with _escalated_lock:
+        key = _question_key(question)
+        if hit:
+            _cache_misses.pop(key, None)
+            return
+        _cache_misses[key] = _cache_misses.get(key, 0) + 1
+        _cache_misses.move_to_end(key)
+        while len(_cache_misses) > MAX_REMEMBERED_QUESTIONS:
+            _cache_misses.popitem(last=False)
+
+
+def referenced_tables(question: str, schema_context: str = "") -> int:
+    """
+    Counts the retrieved tables the question actually names ("orders", "order",
+    "order items" for order_items). Retrieval always returns several tables, so the
+    number retrieved says nothing about the question.
+    """
+    text = question.lower()
+    count = 0
+    for name in set(TABLE_NAME.findall(schema_context or "")):
+        base = name.lower().strip('"`').replace("_", " ")
+        singular = base[:-1] if base.endswith("s") and len(base) > 3 else base
+        if re.search(rf'\b({re.escape(base)}|{re.escape(singular)}s?)\b', text):
+            count += 1
+    return count
+
+
+def score_question(question: str, schema_context: str = "") -> int:
+    """
+    Scores how hard a question is to translate into SQL:
+      +2 per table the question names beyond the first (needs a join)
+      +2 per join keyword ("with their", "compared", "who have", ...)
+      +2 per analytic keyword (rank, trend, percentage, growth, ...)
+      +1 per simple aggregation keyword (by, per, total, ...), at most SIMPLE_AGGREGATION_CAP
+      +1 per earlier result-cache miss after the first, at most CACHE_MISS_CAP
+    plus a large penalty if the question previously needed escalation.
+    With the default threshold of 3, "count orders by status" stays on the fast tier and
+    "customers who have more than 5 orders" goes to the strong tier.
+    """
+    score = 0
+
+    score += 2 * max(0, referenced_tables(question, schema_context) - 1)
+    score += 2 * len(JOIN_KEYWORDS.findall(question))
+    score += 2 * len(ANALYTIC_KEYWORDS.findall(question))
+    score += min(SIMPLE_AGGREGATION_CAP, len(SIMPLE_AGGREGATION_KEYWORDS.findall(question)))
+
+    with _escalated_lock:
+        key = _question_key(question)
+        if key in _escalated_questions:
+            score += COMPLEXITY_THRESHOLD
+        # The first run of a question always misses; repeated misses are the signal
+        score += min(CACHE_MISS_CAP, max(0, _cache_misses.get(key, 0) - 1))
+
+    return score
+
+
+def choose_tier(question: str, schema_context: str = "") -> str:
+    """
+    Returns "fast" or "strong" for a fresh (non-retry) question.
+    """
+    if not routing_enabled():
+        return "strong"
+    return "fast" if score_question(question, schema_context) < COMPLEXITY_THRESHOLD else "strong"
+
+
+def get_tier_llm(tier: str):
+    """
+    Returns the LLM client for a tier. The fast tier uses LLM_FAST_PROVIDER / LLM_FAST_MODEL.
+    """
+    if tier != "fast":
+        return get_llm()
+
+    provider = (os.getenv("LLM_FAST_PROVIDER") or os.getenv("LLM_PROVIDER", DEFAULT_PROVIDER)).lower()
+    model = os.getenv("LLM_FAST_MODEL") or FAST_MODELS.get(provider)
+    return get_llm(provider=provider, model=model)
+
+
+def route_generation(state) -> str:
+    """
+    Picks the tier for generator_node. A retry after a validator failure always
+    escalates to the strong tier and is recorded so the question is routed there next time.
+    """
+    previous_tier = state.get("model_tier")
+
+    if state.get("error"):
+        if previous_tier == "fast":
+            metrics.incr("router.escalations")
+            remember_escalation(state["question"])
+        return "strong"
+
+    tier = previous_tier or choose_tier(state["question"], state.get("schema_context", ""))
+    metrics.incr(f"router.{tier}.routed")
+    return tier
+
+
+def routing_stats() -> dict:
+    """
+    Per-tier routing counts plus the share of fast-tier generations that had to escalate.
+    """
+    fast = metrics.counter("router.fast.routed")
+    strong = metrics.counter("router.strong.routed")
+    escalations = metrics.counter("router.escalations")
+    return {
+        "fast_routed": fast,
+        "strong_routed": strong,
+        "escalations": escalations,
+        "escalation_rate": round(escalations / fast, 4) if fast else 0.0,
+    }
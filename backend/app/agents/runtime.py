@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+import importlib.util
+from app.services.metrics import metrics
+
+# Packages the agent needs; checked with find_spec so nothing heavy is imported at startup
+AGENT_MODULES = ["langgraph", "langchain_core", "sqlglot"]
+
+_agent = None
+_agent_lock = threading.Lock()
+
+# Failed warmup steps are retried with exponential backoff (capped), e.g. while the
+# model server or the database is still starting. 0 attempts = keep retrying.
+WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", "0"))
+WARMUP_RETRY_BASE_SECONDS = float(os.getenv("WARMUP_RETRY_BASE_SECONDS", "1"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "30"))
+
+# Warmup progress, reported by /readyz
+_state = {"status": "cold", "error": None, "attempts": 0, "steps": {}}
+_state_lock = threading.Lock()
+
+
+def agent_available() -> bool:
+    """
+    True if every agent dependency is installed (without importing any of them).
+    """
+    modules = list(AGENT_MODULES)
+    if os.getenv("VECTOR_SERVICE_URL"):
+        # Embeddings and the vector store live in the shared model server
+        modules.append("requests")
+    else:
+        if os.getenv("EMBEDDING_BACKEND", "torch").lower() == "onnx":
+            modules += ["onnxruntime", "tokenizers"]
+        else:
+            modules.append("sentence_transformers")
+        if os.getenv("VECTOR_BACKEND", "chroma").lower() == "chroma":
+            modules.append("chromadb")
+    return all(importlib.util.find_spec(name) is not None for name in modules)
+
+
+def get_agent():
+    """
+    Returns the compiled agent graph, building it once per process.
+    """
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                from app.agents.graph import build_graph
+                _agent = build_graph()
+    return _agent
+
+
+def _step(name: str, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    metrics.observe(f"startup.{name}", elapsed)
+    with _state_lock:
+        _state["steps"][name] = round(elapsed, 3)
+
+
+def _agent_steps() -> list:
+    from app.services.rag import get_vector_service
+    return [
+        ("agent_graph", get_agent),
+        ("vector_service", get_vector_service),
+        ("embedding_warmup", lambda: get_vector_service().embedding_model.encode("warmup")),
+    ]
+
+
+def warmup(extra_steps: list = None, include_agent: bool = True):
+    """
+    Preloads everything the first /query would otherwise pay for: the agent graph
+    (langgraph/langchain imports), the embedding model and Chroma, and one encode pass.
+    `extra_steps` is a list of (name, callable) run first, e.g. demo DB seeding.
+    With include_agent=False only `extra_steps` run (agent dependencies not installed).
+    A failing step is retried with backoff; steps that already succeeded are not re-run.
+    """
+    with _state_lock:
+        _state["status"] = "warming"
+    start = time.perf_counter()
+    steps = list(extra_steps or [])
+    agent_steps_added = False
+    attempt = 0
+
+    try:
+        while True:
+            attempt += 1
+            try:
+                if include_agent and not agent_steps_added:
+                    steps += _agent_steps()
+                    agent_steps_added = True
+                for name, fn in steps:
+                    with _state_lock:
+                        done = name in _state["steps"]
+                    if not done:
+                        _step(name, fn)
+
+                with _state_lock:
+                    _state["status"] = "ready"
+                    _state["error"] = None
+                return
+            except Exception as e:
+                with _state_lock:
+                    _state["error"] = str(e)
+                    _state["attempts"] = attempt
+                if WARMUP_MAX_ATTEMPTS and attempt >= WARMUP_MAX_ATTEMPTS:
+                    print(f"Warmup failed after {attempt} attempts: {e}")
+                    with _state_lock:
+                        _state["status"] = "failed"
+                    return
+                delay = min(WARMUP_RETRY_MAX_SECONDS, WARMUP_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+                print(f"Warmup attempt {attempt} failed: {e}; retrying in {delay:.1f}s")
+                metrics.incr("startup.warmup_retries")
+                time.sleep(delay)
+    finally:
+        metrics.observe("startup.warmup", time.perf_counter() - start)
+
+
+def start_warmup(extra_steps: list = None, include_agent: bool = True) -> threading.Thread:
+    """
+    Runs `warmup` in a daemon thread so the server accepts connections immediately.
+    """
+    thread = threading.Thread(target=warmup, args=(extra_steps, include_agent), name="agent-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> dict:
+    with _state_lock:
+        return {"status": _state["status"], "error": _state["error"], "attempts": _state["attempts"], "steps": dict(_state["steps"])}
+
+
+def is_ready() -> bool:
+    with _state_lock:
+        return _state["status"] == "ready"
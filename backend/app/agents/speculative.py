@@ -0,0 +1,99 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from langchain_core.messages import HumanMessage
+from app.agents.sql_checks import check_sql
+from app.services.database import explain_query
+from app.services.metrics import metrics
+
+# Prompt variations so parallel candidates differ even at temperature 0
+PROMPT_VARIANTS = [
+    "",
+    "Use explicit JOIN ... ON syntax and qualify every column with its table name.",
+    "Prefer a CTE (WITH ...) if it makes the query simpler.",
+    "Double-check every table and column name against the Context before using it.",
+]
+
+
+def candidate_fan_out(llm=None) -> int:
+    """
+    Number of parallel SQL candidates per generation (SQL_CANDIDATES, default 1 = off).
+    Losing candidates are not interrupted: they keep their provider slot until the call
+    returns. So one generation never takes more than LLM_MAX_CONCURRENCY - 1 slots,
+    leaving room for other requests at the cost of fewer candidates.
+    """
+    fan_out = max(1, int(os.getenv("SQL_CANDIDATES", "1")))
+    limit = getattr(llm, "max_concurrency", None)
+    if limit:
+        fan_out = min(fan_out, max(1, limit - 1))
+    return fan_out
+
+
+def explain_enabled() -> bool:
+    return os.getenv("SQL_CANDIDATE_EXPLAIN", "false").lower() in ("1", "true", "yes")
+
+
+def _token_usage(response) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+def _generate_and_check(llm, system_msg, prompt: str, variant: str):
+    """
+    Generates one candidate and validates it locally (sqlglot, then optionally EXPLAIN).
+    Returns (sql, error, tokens).
+    """
+    content = f"{prompt}\n{variant}" if variant else prompt
+    response = llm.invoke([system_msg, HumanMessage(content=content)])
+    metrics.incr("generator.candidates")
+
+    clean_query, error = check_sql(response.content)
+    if error is None and explain_enabled():
+        error = explain_query(clean_query, db_url=os.getenv("AGENT_DATABASE_URL"))
+    return clean_query, error, _token_usage(response)
+
+
+def _count_abandoned(future):
+    # Runs when a candidate that lost the race finishes; cancelled ones never spent tokens
+    if future.cancelled() or future.exception() is not None:
+        return
+    metrics.incr("generator.abandoned_tokens", future.result()[2])
+
+
+def generate_candidates(llm, system_msg, prompt: str, fan_out: int) -> str:
+    """
+    Requests `fan_out` candidate queries concurrently and returns the first valid one.
+    If none is valid the first candidate is returned so the validator's retry loop takes over.
+    """
+    variants = [PROMPT_VARIANTS[i % len(PROMPT_VARIANTS)] for i in range(fan_out)]
+    pool = ThreadPoolExecutor(max_workers=fan_out)
+    futures = {pool.submit(_generate_and_check, llm, system_msg, prompt, v): i for i, v in enumerate(variants)}
+
+    fallback = None
+    collected = set()
+    try:
+        for future in as_completed(futures):
+            collected.add(future)
+            try:
+                sql, error, tokens = future.result()
+            except Exception as e:
+                print(f"Candidate generation failed: {e}")
+                continue
+            metrics.incr("generator.candidate_tokens", tokens)
+
+            if error is None:
+                metrics.incr("generator.candidate_wins")
+                return sql
+            metrics.incr("generator.candidates_rejected")
+            if fallback is None or futures[future] == 0:
+                fallback = sql
+    finally:
+        # Don't wait for slower candidates once we have a winner. Calls already in
+        # flight can't be interrupted; their tokens are counted when they finish.
+        pool.shutdown(wait=False, cancel_futures=True)
+        for future in futures:
+            if future not in collected:
+                future.add_done_callback(_count_abandoned)
+
+    if fallback is None:
+        raise RuntimeError("All SQL candidates failed to generate")
+    return fallback
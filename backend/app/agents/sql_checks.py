@@ -0,0 +1,31 @@
+import sqlglot
+from sqlglot import exp
+
+
+def clean_sql(sql_query: str) -> str:
+    """
+    Removes markdown backticks if the LLM added them.
+    """
+    return sql_query.replace("```sql", "").replace("```", "").strip()
+
+
+def check_sql(sql_query: str):
+    """
+    Parses the SQL and makes sure it is a single SELECT statement.
+    Returns (clean_query, error) where error is None for a valid query.
+    """
+    clean_query = clean_sql(sql_query)
+
+    try:
+        # Parse the SQL into an Abstract Syntax Tree (AST)
+        # This will fail if the syntax is broken (e.g. missing commas)
+        parsed = sqlglot.parse_one(clean_query)
+    except Exception as e:
+        return clean_query, f"SQL Syntax Error: {str(e)}"
+
+    # Security Check: Ensure it's a SELECT statement
+    # We use isinstance to check the AST node type
+    if not isinstance(parsed, exp.Select):
+        return clean_query, "Security Alert: Only SELECT statements are allowed."
+
+    return clean_query, None
@@ -10,3 +10,5 @@ class AgentState(TypedDict):
     error: Optional[str]       # Any error messages
     retry_count: int           # Counter for self-correction loops
     final_answer: Optional[str]# The narrative response
+    model_tier: Optional[str]  # "fast" or "strong", chosen by the router
+    history: Optional[dict]    # Previous turn of the session: question, schema_context, sql_query, result_digest
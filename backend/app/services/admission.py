@@ -0,0 +1,151 @@
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from app.services.metrics import metrics
+
+# Global and per-user caps on concurrent agent runs, plus a short bounded wait queue
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "8"))
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "2"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed. `retry_after` is a suggested wait in whole seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded scheduler for agent runs on one event loop (one per worker).
+
+    A request runs immediately if both the global and its user's in-flight counts are
+    under their caps. Otherwise it waits in a FIFO queue until a slot frees up or its
+    deadline passes; when the queue itself is full it is rejected straight away.
+    Freed slots go to the oldest waiter whose user is under the per-user cap, so one
+    busy user can't starve everyone queued behind them.
+    A ticket can reserve several global slots at once (`slot(user_id, weight=n)`, used by
+    /query/batch); it still counts as a single run against the user's cap.
+    """
+
+    def __init__(self, max_inflight: int = ADMISSION_MAX_INFLIGHT, max_per_user: int = ADMISSION_MAX_PER_USER,
+                 max_queue: int = ADMISSION_MAX_QUEUE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.max_inflight = max(1, max_inflight)
+        self.max_per_user = max(1, max_per_user)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._inflight = 0
+        self._per_user = {}
+        self._waiters = deque()  # (user_id, future, weight)
+        self._avg_service = 1.0  # EWMA of run time in seconds, used for Retry-After
+
+    def _can_run(self, user_id, weight: int = 1) -> bool:
+        return self._inflight + weight <= self.max_inflight and self._per_user.get(user_id, 0) < self.max_per_user
+
+    def _start(self, user_id, weight: int = 1):
+        self._inflight += weight
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    def _finish(self, user_id, weight: int = 1):
+        self._inflight -= weight
+        remaining = self._per_user.get(user_id, 1) - 1
+        if remaining:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        for waiter in list(self._waiters):
+            waiter_user, future, weight = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+                continue
+            # A wide ticket that doesn't fit yet keeps its place rather than being overtaken
+            if self._inflight + weight > self.max_inflight:
+                break
+            if self._per_user.get(waiter_user, 0) < self.max_per_user:
+                self._waiters.remove(waiter)
+                self._start(waiter_user, weight)
+                future.set_result(True)
+
+    def retry_after(self) -> int:
+        # Roughly how long until the current backlog drains
+        backlog = len(self._waiters) + self._inflight
+        return max(1, int(self._avg_service * backlog / self.max_inflight + 0.999))
+
+    @asynccontextmanager
+    async def slot(self, user_id, weight: int = 1):
+        """
+        Holds `weight` global in-flight slots (one per-user slot) for `user_id` for the
+        duration of the block. Raises Overloaded when the queue is full or the wait
+        exceeds the deadline.
+        """
+        weight = max(1, min(weight, self.max_inflight))
+        queued_at = time.perf_counter()
+
+        if self._can_run(user_id, weight) and not self._waiters:
+            self._start(user_id, weight)
+        else:
+            if len(self._waiters) >= self.max_queue:
+                metrics.incr("admission.rejected")
+                raise Overloaded("Server is busy, queue is full", self.retry_after())
+
+            future = asyncio.get_running_loop().create_future()
+            waiter = (user_id, future, weight)
+            self._waiters.append(waiter)
+            # A slot may be free for this user even though others are queued
+            self._wake_waiters()
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                if future.done() and not future.cancelled():
+                    # Admitted at the last moment; give the slot back
+                    self._finish(user_id, weight)
+                else:
+                    future.cancel()
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                metrics.incr("admission.timeouts")
+                raise Overloaded("Timed out waiting for a free slot", self.retry_after())
+            except asyncio.CancelledError:
+                # Client went away while queued
+                if future.done() and not future.cancelled():
+                    self._finish(user_id, weight)
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+
+        wait = time.perf_counter() - queued_at
+        metrics.observe("admission.wait", wait)
+        metrics.incr("admission.admitted")
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._avg_service = 0.8 * self._avg_service + 0.2 * elapsed
+            self._finish(user_id, weight)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self._inflight,
+            "queue_depth": len(self._waiters),
+            "users_inflight": len(self._per_user),
+            "max_inflight": self.max_inflight,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+        }
+
+
+# Shared scheduler for /query (per worker process)
+admission = AdmissionController()
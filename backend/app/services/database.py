@@ -1,9 +1,24 @@
 import os
+import datetime
+import decimal
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool as pg_pool
 from dotenv import load_dotenv
+from app.services.result_cache import result_cache, cache_key, RESULT_CACHE_ENABLED
 
 load_dotenv()
 
+# Upper bound for agent-generated queries so a runaway query can't hold a connection forever
+AGENT_STATEMENT_TIMEOUT_MS = int(os.getenv("AGENT_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Connections kept open per database for agent queries (0 disables pooling)
+AGENT_DB_POOL_SIZE = int(os.getenv("AGENT_DB_POOL_SIZE", "10"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
 
 def get_db_connection(db_url: str = None):
     """
@@ -19,30 +34,142 @@ def get_db_connection(db_url: str = None):
         return None
 
 
-def execute_query(query: str, db_url: str = None):
+def _get_pool(url: str):
+    with _pools_lock:
+        if url not in _pools:
+            _pools[url] = pg_pool.ThreadedConnectionPool(1, AGENT_DB_POOL_SIZE, url)
+        return _pools[url]
+
+
+@contextmanager
+def pooled_connection(db_url: str = None):
+    """
+    Borrows a connection from the per-database pool (or opens a fresh one when pooling
+    is disabled or the pool is exhausted). Yields None if the database is unreachable.
+    """
+    url = db_url or os.getenv("DATABASE_URL")
+    pool = None
+    conn = None
+    if AGENT_DB_POOL_SIZE > 0:
+        try:
+            pool = _get_pool(url)
+            conn = pool.getconn()
+        except pg_pool.PoolError:
+            pool = None
+        except Exception as e:
+            print(f"Database connection failed: {e}")
+            yield None
+            return
+
+    if conn is None:
+        conn = get_db_connection(url)
+        if conn is None:
+            yield None
+            return
+
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        broken = True
+        raise
+    finally:
+        if pool is None:
+            conn.close()
+        else:
+            try:
+                # Leave no open transaction behind for the next borrower
+                conn.rollback()
+            except Exception:
+                broken = True
+            pool.putconn(conn, close=broken or conn.closed != 0)
+
+
+def to_plain(value):
+    """
+    Converts Decimal/date values to plain Python literals so `str(results)` can be
+    read back with `ast.literal_eval` (the API and the narrator both parse it).
+    """
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() and value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    return value
+
+
+def format_results(colnames: list, rows: list) -> str:
+    """
+    Formats rows as a list of dicts (JSON-like) string, the shape the agent state carries.
+    """
+    return str([dict(zip(colnames, row)) for row in rows])
+
+
+def execute_query(query: str, db_url: str = None, use_cache: bool = False):
     """
     Executes a read-only query and returns results.
     If `db_url` is provided the query runs against that database.
+    With `use_cache`, identical (normalized) queries are served from the result cache.
     """
-    conn = get_db_connection(db_url)
-    if not conn:
-        return "Error: Database disconnected."
+    if use_cache:
+        return execute_cached_query(query, db_url)[0]
+    return _run_query(query, db_url)
 
-    try:
-        cur = conn.cursor()
-        cur.execute(query)
 
-        # Fetch column names
-        colnames = [desc[0] for desc in cur.description] if cur.description else []
-        # Fetch data
-        rows = cur.fetchall() if cur.description else []
+def execute_cached_query(query: str, db_url: str = None):
+    """
+    Like execute_query(use_cache=True), but returns (result, cache_hit).
+    cache_hit is None when the query can't be cached (caching off, volatile or unparseable).
+    """
+    key = cache_key(query, db_url) if RESULT_CACHE_ENABLED else None
+    if not key:
+        return _run_query(query, db_url), None
+    cached = result_cache.get(key)
+    if cached is not None:
+        return format_results(*cached), True
+    return _run_query(query, db_url, key), False
 
-        # Format as a list of dicts (JSON-like)
-        results = [dict(zip(colnames, row)) for row in rows]
 
-        cur.close()
-        conn.close()
-        return str(results)
+def _run_query(query: str, db_url: str = None, key: str = None):
+    # Stores the rows under `key` in the result cache when one is given
+    with pooled_connection(db_url) as conn:
+        if not conn:
+            return "Error: Database disconnected."
 
-    except Exception as e:
-        return f"Database Error: {str(e)}"
+        try:
+            cur = conn.cursor()
+            if AGENT_STATEMENT_TIMEOUT_MS > 0:
+                cur.execute("SET statement_timeout = %s", (AGENT_STATEMENT_TIMEOUT_MS,))
+            cur.execute(query)
+
+            # Fetch column names
+            colnames = [desc[0] for desc in cur.description] if cur.description else []
+            # Fetch data
+            rows = [tuple(map(to_plain, row)) for row in cur.fetchall()] if cur.description else []
+            cur.close()
+
+            if key:
+                result_cache.put(key, colnames, rows)
+            return format_results(colnames, rows)
+
+        except Exception as e:
+            return f"Database Error: {str(e)}"
+
+
+def explain_query(query: str, db_url: str = None):
+    """
+    Dry-runs a query with EXPLAIN (plans it without executing it).
+    Returns None if the database accepts the query, otherwise the error message.
+    """
+    with pooled_connection(db_url) as conn:
+        if not conn:
+            return "Error: Database disconnected."
+
+        try:
+            cur = conn.cursor()
+            cur.execute(f"EXPLAIN {query}")
+            cur.close()
+            return None
+        except Exception as e:
+            return f"Database Error: {str(e)}"
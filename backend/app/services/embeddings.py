@@ -0,0 +1,129 @@
+import os
+import argparse
+import numpy as np
+
+# We use a free, high-performance open model for embeddings
+# 'all-MiniLM-L6-v2' is the industry standard for lightweight local embeddings
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# "torch" runs the model through sentence-transformers; "onnx" runs an exported,
+# int8-quantized copy through onnxruntime, without importing torch at all.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_PATH = os.getenv(
+    "EMBEDDING_ONNX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "onnx_model")
+)
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # 0 = onnxruntime default
+
+# all-MiniLM-L6-v2 was trained with 256-token inputs
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxEmbedder:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by onnxruntime.
+    Mean-pools the last hidden state and L2-normalizes, like the sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_PATH, threads: int = EMBEDDING_ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"No quantized ONNX model at {model_path}. "
+                "Export one with: python -m app.services.embeddings export"
+            )
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+    def encode(self, sentences, batch_size: int = 32):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            outputs.append((pooled / np.clip(norms, 1e-12, None)).astype(np.float32))
+
+        embeddings = np.concatenate(outputs) if outputs else np.zeros((0, 384), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(backend: str = None):
+    """
+    Returns an object with a SentenceTransformer-compatible `encode` for the configured backend.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "onnx":
+        return OnnxEmbedder()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        # Downloads automatically on first run
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Choose 'torch' or 'onnx'")
+
+
+def export_onnx(output_dir: str = EMBEDDING_ONNX_PATH, model_name: str = EMBEDDING_MODEL_NAME):
+    """
+    One-off export: PyTorch model -> ONNX (fp32) -> dynamic int8 quantization.
+    Needs torch, transformers and onnxruntime; the serving path then only needs onnxruntime + tokenizers.
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    hub_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name).eval()
+
+    dummy = tokenizer(["Which customers placed the most orders?"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "token_type_ids": dynamic, "last_hidden_state": dynamic},
+            opset_version=14
+        )
+
+    quantize_dynamic(fp32_path, os.path.join(output_dir, "model_quantized.onnx"), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+    print(f"Exported int8 ONNX model to {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding model utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export and int8-quantize the embedding model to ONNX")
+    export.add_argument("--output", default=EMBEDDING_ONNX_PATH)
+    export.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.output, args.model)
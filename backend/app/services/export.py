@@ -0,0 +1,169 @@
+import io
+import os
+import csv
+import decimal
+from app.services.database import get_db_connection, to_plain
+
+# Hard cap on exported rows (the request's `limit` can only lower it) and fetch size per round trip
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "1000000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "300000"))
+
+# Postgres type OIDs -> Arrow type names (anything else is exported as a string)
+PG_TO_ARROW = {
+    16: "bool",
+    20: "int64", 21: "int64", 23: "int64",
+    700: "float64", 701: "float64", 1700: "float64",
+    1082: "date32",
+    1114: "timestamp",
+    1184: "timestamptz",
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def stream_rows(sql: str, db_url: str = None, limit: int = None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Runs `sql` through a server-side (named) cursor and yields the column description
+    first, then lists of up to `chunk_rows` rows, so memory stays flat for any result size.
+    The row limit is pushed into Postgres so it stops producing rows early.
+    """
+    limit = min(limit or EXPORT_MAX_ROWS, EXPORT_MAX_ROWS)
+    conn = get_db_connection(db_url)
+    if not conn:
+        raise ExportError("Database disconnected.")
+
+    try:
+        setup = conn.cursor()
+        if EXPORT_STATEMENT_TIMEOUT_MS > 0:
+            setup.execute("SET statement_timeout = %s", (EXPORT_STATEMENT_TIMEOUT_MS,))
+        setup.close()
+
+        cur = conn.cursor(name="querymind_export")
+        cur.itersize = chunk_rows
+        # No query parameters: psycopg2 would %-format the whole string and break on
+        # LIKE 'A%' or the modulo operator, so the (integer) limit is inlined instead.
+        # The query sits on its own lines so a trailing -- comment can't swallow the ")".
+        cur.execute(f"SELECT * FROM (\n{sql.strip().rstrip(';')}\n) AS export_query LIMIT {int(limit)}")
+
+        # Named cursors only fill in .description after the first fetch
+        chunk = cur.fetchmany(chunk_rows)
+        yield [(desc[0], desc[1]) for desc in cur.description]
+        while chunk:
+            yield chunk
+            chunk = cur.fetchmany(chunk_rows)
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def export_csv(sql: str, db_url: str = None, limit: int = None):
+    rows = stream_rows(sql, db_url, limit)
+    columns = next(rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for chunk in rows:
+        writer.writerows([[to_plain(v) for v in row] for row in chunk])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _arrow_schema(columns: list):
+    import pyarrow as pa
+
+    types = {
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "date32": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types.get(PG_TO_ARROW.get(oid), pa.string())) for name, oid in columns])
+
+
+def _arrow_batch(schema, chunk: list):
+    import pyarrow as pa
+
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in chunk]
+        if pa.types.is_floating(field.type):
+            values = [float(v) if isinstance(v, decimal.Decimal) else v for v in values]
+        elif pa.types.is_string(field.type):
+            values = [None if v is None else str(to_plain(v)) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _DrainBuffer(io.RawIOBase):
+    """
+    Write-only sink whose contents are handed out (and forgotten) after every batch.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ExportError("Arrow and Parquet exports require the pyarrow package")
+
+
+def export_arrow(sql: str, db_url: str = None, limit: int = None):
+    _require_pyarrow()
+    import pyarrow as pa
+
+    rows = stream_rows(sql, db_url, limit)
+    schema = _arrow_schema(next(rows))
+    sink = _DrainBuffer()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for chunk in rows:
+            writer.write_batch(_arrow_batch(schema, chunk))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_parquet(sql: str, db_url: str = None, limit: int = None):
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = stream_rows(sql, db_url, limit)
+    schema = _arrow_schema(next(rows))
+    sink = _DrainBuffer()
+    # One row group per fetched chunk; the footer is written on close
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for chunk in rows:
+            writer.write_batch(_arrow_batch(schema, chunk))
+            yield sink.drain()
+    yield sink.drain()
+
+
+# format -> (generator, media type, file extension)
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv", "csv"),
+    "arrow": (export_arrow, "application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": (export_parquet, "application/vnd.apache.parquet", "parquet"),
+}
@@ -1,21 +1,257 @@
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_llm():
+# Which backend to talk to. "groq" is the production default, "stub" is a
+# deterministic in-process model for offline tests and load tests, and
+# "openai" talks to any OpenAI-compatible server (including the stub server in
+# app/services/llm_stub.py).
+DEFAULT_PROVIDER = "groq"
+DEFAULT_MODELS = {
+    "groq": "llama-3.3-70b-versatile",
+    "stub": "stub-sql",
+    "openai": "gpt-4o-mini",
+}
+
+# Defaults for the in-flight cap and the per-call timeout (overridable per provider)
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+def _provider_setting(provider: str, name: str, default):
     """
-    Returns an instance of the Groq LLM (Llama 3 70B).
-    Temperature is set to 0 for SQL generation to ensure consistency/determinism.
+    Reads LLM_<PROVIDER>_<NAME>, falling back to LLM_<NAME> and then `default`.
     """
+    value = os.getenv(f"LLM_{provider.upper()}_{name}") or os.getenv(f"LLM_{name}")
+    if value is None or value == "":
+        return default
+    return type(default)(value)
+
+
+def _build_groq(model: str, timeout: float):
+    from langchain_groq import ChatGroq
+
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY not found in environment variables")
-    
+
+    # Temperature is set to 0 for SQL generation to ensure consistency/determinism.
     return ChatGroq(
-        temperature=0, 
-        model_name="llama-3.3-70b-versatile",
-        groq_api_key=api_key
+        temperature=0,
+        model_name=model,
+        groq_api_key=api_key,
+        timeout=timeout,
+        max_retries=1
+    )
+
+
+def _build_stub(model: str, timeout: float):
+    from app.services.llm_stub import StubChatModel
+
+    return StubChatModel(model_name=model)
+
+
+def _build_openai(model: str, timeout: float):
+    try:
+        from langchain_openai import ChatOpenAI
+    except ImportError:
+        raise ValueError("LLM_PROVIDER=openai requires the langchain-openai package")
+
+    return ChatOpenAI(
+        temperature=0,
+        model=model,
+        base_url=os.getenv("LLM_BASE_URL"),
+        api_key=os.getenv("LLM_API_KEY", "not-needed"),
+        timeout=timeout,
+        max_retries=1
     )
+
+
+PROVIDERS = {
+    "groq": _build_groq,
+    "stub": _build_stub,
+    "openai": _build_openai,
+}
+
+# One semaphore per provider so every client of that provider shares the same cap
+_semaphores = {}
+_clients = {}
+_narrators = {}
+_registry_lock = threading.Lock()
+
+
+def _get_semaphore(provider: str):
+    with _registry_lock:
+        if provider not in _semaphores:
+            limit = _provider_setting(provider, "MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+            _semaphores[provider] = threading.BoundedSemaphore(max(1, limit))
+        return _semaphores[provider]
+
+
+class LLMClient:
+    """
+    Wraps a chat model with lazy construction, a per-provider in-flight cap and a timeout.
+    The underlying model (and its HTTP connection pool) is built on first use and reused.
+    """
+
+    def __init__(self, provider: str, model: str):
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider '{provider}'. Choose from: {', '.join(PROVIDERS)}")
+        self.provider = provider
+        self.model_name = model
+        self.timeout = _provider_setting(provider, "TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)
+        self.max_concurrency = max(1, _provider_setting(provider, "MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self._semaphore = _get_semaphore(provider)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = PROVIDERS[self.provider](self.model_name, self.timeout)
+        return self._model
+
+    @property
+    def supports_batching(self) -> bool:
+        # Only providers that serve a whole batch in one call benefit from micro-batching
+        return getattr(self.model, "supports_batching", False)
+
+    def _acquire(self):
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Timed out waiting for a free {self.provider} LLM slot")
+
+    def invoke(self, messages):
+        self._acquire()
+        try:
+            return self.model.invoke(messages)
+        finally:
+            self._semaphore.release()
+
+    def batch(self, batch_messages: list):
+        if self.supports_batching:
+            # A single provider call for the whole batch occupies a single slot
+            self._acquire()
+            try:
+                return self.model.batch(batch_messages)
+            finally:
+                self._semaphore.release()
+
+        # No native batching: fan out, still bounded by the shared semaphore
+        with ThreadPoolExecutor(max_workers=max(1, len(batch_messages))) as pool:
+            return list(pool.map(self.invoke, batch_messages))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent `invoke` calls for a short window and sends them as one batch.
+    The first caller in a window becomes the leader and flushes up to `max_batch` calls
+    for everyone; callers beyond that stay queued and the first of them leads the next batch.
+    """
+
+    def __init__(self, client: LLMClient, window_ms: int, max_batch: int = 8):
+        self.client = client
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = []  # (messages, future, wake) in arrival order
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+
+    def invoke(self, messages):
+        future = Future()
+        # Set when this call's result is in, or when it has been promoted to leader
+        wake = threading.Event()
+        with self._lock:
+            self._pending.append((messages, future, wake))
+            is_leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+
+        if is_leader:
+            self._full.wait(self.window)
+        else:
+            if not wake.wait(self.client.timeout + self.window):
+                with self._lock:
+                    if not wake.is_set():
+                        # Give up our place; if we were next in line, hand the lead on
+                        entry = (messages, future, wake)
+                        was_next = bool(self._pending) and self._pending[0] == entry
+                        self._pending.remove(entry)
+                        if was_next and self._pending:
+                            self._pending[0][2].set()
+                        raise TimeoutError("Timed out waiting for a batched LLM call")
+            if future.done():
+                return future.result()
+            # Promoted: these calls already waited out a window, so flush right away
+
+        with self._lock:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if len(self._pending) < self.max_batch:
+                self._full.clear()
+            next_leader = self._pending[0] if self._pending else None
+        if next_leader is not None:
+            next_leader[2].set()
+
+        try:
+            responses = self.client.batch([m for m, _, _ in batch])
+            for (_, f, _), response in zip(batch, responses):
+                f.set_result(response)
+        except Exception as e:
+            for _, f, _ in batch:
+                if not f.done():
+                    f.set_exception(e)
+        for _, _, w in batch:
+            w.set()
+
+        return future.result()
+
+
+def get_llm(provider: str = None, model: str = None) -> LLMClient:
+    """
+    Returns a shared LLM client for the configured provider (LLM_PROVIDER, default Groq Llama 3 70B).
+    Construction is lazy, so a missing API key only fails the first call, not the import.
+    """
+    provider = (provider or os.getenv("LLM_PROVIDER", DEFAULT_PROVIDER)).lower()
+    model = model or os.getenv("LLM_MODEL") or DEFAULT_MODELS.get(provider)
+
+    key = (provider, model)
+    with _registry_lock:
+        client = _clients.get(key)
+    if client is None:
+        client = LLMClient(provider, model)
+        with _registry_lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def get_narrator_llm(client: LLMClient = None):
+    """
+    Returns the client used for narration, wrapped in a shared MicroBatcher when
+    LLM_NARRATOR_BATCH_WINDOW_MS > 0 and the provider can serve batches natively.
+    """
+    client = client or get_llm()
+    window_ms = int(os.getenv("LLM_NARRATOR_BATCH_WINDOW_MS", "0"))
+    if window_ms <= 0:
+        return client
+
+    key = (client.provider, client.model_name)
+    with _registry_lock:
+        narrator = _narrators.get(key)
+    if narrator is not None:
+        return narrator
+
+    try:
+        if not client.supports_batching:
+            return client
+    except Exception as e:
+        print(f"Narrator batching disabled: {e}")
+        return client
+
+    max_batch = int(os.getenv("LLM_NARRATOR_MAX_BATCH", "8"))
+    with _registry_lock:
+        return _narrators.setdefault(key, MicroBatcher(client, window_ms=window_ms, max_batch=max_batch))
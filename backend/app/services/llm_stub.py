@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.messages import AIMessage
+
+# Optional artificial latency so load tests see realistic queueing
+STUB_LATENCY_MS = int(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+
+TABLE_PATTERN = re.compile(r'(?:Table:\s*|CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?)[`\"]?([A-Za-z0-9_]+)', re.IGNORECASE)
+QUESTION_PATTERN = re.compile(r'(?:User Question|Original Question|Question):\s*(.+)')
+
+
+def _role_and_content(message):
+    """
+    Accepts LangChain messages or OpenAI-style dicts.
+    """
+    if isinstance(message, dict):
+        return message.get("role", "user"), message.get("content", "")
+    return getattr(message, "type", "human"), message.content
+
+
+def stub_completion(messages) -> str:
+    """
+    Deterministically answers a chat request. The same prompt always yields the same text.
+    SQL prompts get a COUNT(*) over the first table in the context, everything else gets a summary.
+    """
+    system = " ".join(c for r, c in map(_role_and_content, messages) if r == "system")
+    prompt = "\n".join(c for r, c in map(_role_and_content, messages) if r != "system")
+
+    if "SQL" in system and "Expert" in system:
+        match = TABLE_PATTERN.search(prompt)
+        if match:
+            return f"SELECT COUNT(*) AS count FROM {match.group(1)};"
+        return "SELECT 1 AS result;"
+
+    question = QUESTION_PATTERN.search(prompt)
+    topic = question.group(1).strip() if question else "your question"
+    return f"Here is a summary of the results for: {topic}"
+
+
+class StubChatModel:
+    """
+    Offline stand-in for a chat model with the same invoke/batch surface.
+    """
+    supports_batching = True
+
+    def __init__(self, model_name: str = "stub-sql"):
+        self.model_name = model_name
+
+    def invoke(self, messages):
+        if STUB_LATENCY_MS:
+            time.sleep(STUB_LATENCY_MS / 1000.0)
+        return AIMessage(content=stub_completion(messages))
+
+    def batch(self, batch_messages: list):
+        # One round trip for the whole batch, like a provider with a batch API
+        if STUB_LATENCY_MS:
+            time.sleep(STUB_LATENCY_MS / 1000.0)
+        return [AIMessage(content=stub_completion(m)) for m in batch_messages]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible /v1/chat/completions endpoint backed by `stub_completion`.
+    """
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if STUB_LATENCY_MS:
+            time.sleep(STUB_LATENCY_MS / 1000.0)
+        content = stub_completion(body.get("messages", []))
+
+        payload = json.dumps({
+            "id": "stub-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub-sql"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Keep load-test output readable
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8090):
+    """
+    Runs the stub server. Point the backend at it with
+    LLM_PROVIDER=openai and LLM_BASE_URL=http://<host>:<port>/v1
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    print(f"Stub LLM server listening on http://{host}:{port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic stub LLM server for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    serve(args.host, args.port)
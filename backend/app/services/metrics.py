@@ -0,0 +1,65 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Keep only the most recent samples per latency series so memory stays bounded
+MAX_SAMPLES = 1000
+
+
+class Metrics:
+    """
+    Thread-safe, in-process counters and latency series.
+    Good enough for a single worker; `snapshot()` is what the /metrics endpoint returns.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._latencies.setdefault(name, [])
+            samples.append(seconds)
+            if len(samples) > MAX_SAMPLES:
+                del samples[:len(samples) - MAX_SAMPLES]
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """
+        Returns counters plus count/p50/p95/max (in ms) for every latency series.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = {k: sorted(v) for k, v in self._latencies.items()}
+
+        summary = {}
+        for name, samples in latencies.items():
+            if not samples:
+                continue
+            summary[name] = {
+                "count": len(samples),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return {"counters": counters, "latency": summary}
+
+
+# Global registry shared by the agent nodes and the API
+metrics = Metrics()
@@ -0,0 +1,141 @@
+import os
+import json
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# When set, workers use the shared model server instead of loading their own
+# embedding model and opening the vector store (see RemoteVectorService below)
+VECTOR_SERVICE_URL = os.getenv("VECTOR_SERVICE_URL")
+VECTOR_SERVICE_TIMEOUT = float(os.getenv("VECTOR_SERVICE_TIMEOUT", "30"))
+
+
+class ModelServerHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints around a single in-process VectorService:
+      POST /encode  {"texts": [...]}                          -> {"embeddings": [[...], ...]}
+      POST /schema  {"query", "n_results", "where"}           -> {"schema": "..."}
+      POST /schemas {"queries", "n_results", "where"}         -> {"schemas": ["...", ...]}
+      POST /tables  {"table_name", "ddl", "description"}      -> {"status": "ok"}
+      GET  /healthz
+    Reads run concurrently (one thread per request); table writes go through one lock,
+    so this process is the single writer to the vector store.
+    """
+    protocol_version = "HTTP/1.1"
+    service = None
+    write_lock = threading.Lock()
+
+    def _send(self, code: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send(200, {"status": "ok"})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            service = self.service
+
+            if self.path == "/encode":
+                embeddings = np.asarray(service.embedding_model.encode(body["texts"]), dtype=np.float32)
+                self._send(200, {"embeddings": embeddings.tolist()})
+            elif self.path == "/schema":
+                schema = service.get_relevant_schema(body["query"], n_results=body.get("n_results", 3), where=body.get("where"))
+                self._send(200, {"schema": schema})
+            elif self.path == "/schemas":
+                schemas = service.get_relevant_schemas(body["queries"], n_results=body.get("n_results", 3), where=body.get("where"))
+                self._send(200, {"schemas": schemas})
+            elif self.path == "/tables":
+                with self.write_lock:
+                    service.add_table_context(body["table_name"], body["ddl"], body.get("description", ""))
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": "not found"})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8100):
+    """
+    Loads the embedding model and vector store once and serves them to all workers.
+    """
+    from app.services.rag import VectorService
+
+    ModelServerHandler.service = VectorService()
+    server = ThreadingHTTPServer((host, port), ModelServerHandler)
+    server.daemon_threads = True
+    print(f"Model server listening on http://{host}:{port}")
+    server.serve_forever()
+
+
+class RemoteEmbedder:
+    """
+    `encode` compatible with SentenceTransformer, backed by the model server.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def encode(self, sentences):
+        single = isinstance(sentences, str)
+        payload = self._client._post("/encode", {"texts": [sentences] if single else list(sentences)})
+        embeddings = np.asarray(payload["embeddings"], dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+class RemoteVectorService:
+    """
+    Same interface as VectorService, forwarded to the model server over a keep-alive session.
+    """
+
+    def __init__(self, base_url: str = VECTOR_SERVICE_URL):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+        self._requests = requests
+        self.embedding_model = RemoteEmbedder(self)
+
+    def _session(self):
+        # requests.Session is not thread-safe; keep one pooled session per thread
+        if not hasattr(self._local, "session"):
+            self._local.session = self._requests.Session()
+        return self._local.session
+
+    def _post(self, path: str, payload: dict) -> dict:
+        response = self._session().post(f"{self.base_url}{path}", json=payload, timeout=VECTOR_SERVICE_TIMEOUT)
+        data = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"Model server error on {path}: {data.get('error')}")
+        return data
+
+    def add_table_context(self, table_name: str, ddl: str, description: str):
+        self._post("/tables", {"table_name": table_name, "ddl": ddl, "description": description})
+        print(f"Stored metadata for table: {table_name}")
+
+    def get_relevant_schema(self, user_query: str, n_results: int = 3, where: dict = None):
+        return self._post("/schema", {"query": user_query, "n_results": n_results, "where": where})["schema"]
+
+    def get_relevant_schemas(self, user_queries: list, n_results: int = 3, where: dict = None) -> list:
+        return self._post("/schemas", {"queries": list(user_queries), "n_results": n_results, "where": where})["schemas"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding / vector store server for multi-worker deployments")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -1,22 +1,36 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
 import os
+import threading
+from app.services.embeddings import load_embedding_model
 
-# We use a free, high-performance open model for embeddings
-# 'all-MiniLM-L6-v2' is the industry standard for lightweight local embeddings
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "chroma_db")
 
+# Index backend: "chroma" (default) or "numpy" (memory-mapped brute-force index, see vector_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", os.path.join(os.path.dirname(DB_PATH), "vector_index"))
+
+
+def create_index(backend: str = None):
+    """
+    Builds the configured vector index. Both backends share the upsert/query interface.
+    """
+    backend = (backend or VECTOR_BACKEND).lower()
+    if backend == "numpy":
+        from app.services.vector_index import NumpyVectorIndex
+        return NumpyVectorIndex(NUMPY_INDEX_PATH)
+    if backend == "chroma":
+        from app.services.vector_index import ChromaIndex
+        return ChromaIndex(DB_PATH)
+    raise ValueError(f"Unknown VECTOR_BACKEND '{backend}'. Choose 'chroma' or 'numpy'")
+
+
 class VectorService:
-    def __init__(self):
-        # Initialize the embedding model (downloads automatically on first run)
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    def __init__(self, backend: str = None):
+        # Heavy imports (torch or onnxruntime, chromadb) happen here, not at module import
+        # Initialize the embedding model (EMBEDDING_BACKEND: torch or int8 ONNX)
+        self.embedding_model = load_embedding_model()
         
-        # Initialize ChromaDB (Persistent means it saves to disk)
-        self.client = chromadb.PersistentClient(path=DB_PATH)
-        
-        # Create (or get) a collection named "schema_metadata"
-        self.collection = self.client.get_or_create_collection(name="schema_metadata")
+        # Initialize the vector index (Chroma or the in-process NumPy index)
+        self.index = create_index(backend)
 
     def add_table_context(self, table_name: str, ddl: str, description: str):
         """
@@ -27,10 +41,10 @@ class VectorService:
         document_text = f"Table: {table_name}\nDescription: {description}\nSchema: {ddl}"
         
         # Generate the vector (embedding)
-        embedding = self.embedding_model.encode(document_text).tolist()
+        embedding = self.embedding_model.encode(document_text)
         
-        # Upsert (Update or Insert) into Chroma
-        self.collection.upsert(
+        # Upsert (Update or Insert) into the index
+        self.index.upsert(
             documents=[document_text],
             embeddings=[embedding],
             metadatas=[{"table_name": table_name}],
@@ -38,18 +52,48 @@ class VectorService:
         )
         print(f"Stored metadata for table: {table_name}")
 
-    def get_relevant_schema(self, user_query: str, n_results: int = 3):
+    def get_relevant_schema(self, user_query: str, n_results: int = 3, where: dict = None):
         """
         Finds the most relevant tables for the user's question.
+        `where` optionally restricts matches by metadata (e.g. {"table_name": "orders"}).
         """
-        query_embedding = self.embedding_model.encode(user_query).tolist()
+        query_embedding = self.embedding_model.encode(user_query)
         
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        documents = self.index.query(query_embedding, n_results=n_results, where=where)
         
         # Join the found documents into a single string context
-        if results['documents']:
-            return "\n\n".join(results['documents'][0])
-        return ""
+        return "\n\n".join(documents)
+
+    def get_relevant_schemas(self, user_queries: list, n_results: int = 3, where: dict = None) -> list:
+        """
+        Batch version of get_relevant_schema: embeds every question in one `encode` call.
+        """
+        if not user_queries:
+            return []
+        query_embeddings = self.embedding_model.encode(list(user_queries))
+        
+        return [
+            "\n\n".join(self.index.query(embedding, n_results=n_results, where=where))
+            for embedding in query_embeddings
+        ]
+
+
+_vector_service = None
+_vector_service_lock = threading.Lock()
+
+
+def get_vector_service() -> VectorService:
+    """
+    Returns the process-wide VectorService, loading the model and opening the index on first use.
+    With VECTOR_SERVICE_URL set (multi-worker mode) it returns a client for the shared model server instead.
+    """
+    global _vector_service
+    if _vector_service is None:
+        with _vector_service_lock:
+            if _vector_service is None:
+                if os.getenv("VECTOR_SERVICE_URL"):
+                    from app.services.model_server import RemoteVectorService
+                    _vector_service = RemoteVectorService(os.getenv("VECTOR_SERVICE_URL"))
+                else:
+                    _vector_service = VectorService()
+    return _vector_service
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import sqlglot
+from sqlglot import exp
+from app.services.metrics import metrics
+
+# Total size budget for cached results (compressed bytes) and default entry lifetime
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+# "memory" keeps a private cache per process; "sqlite" shares one cache file between
+# all workers on the host (multi-worker mode), so hits and invalidations are shared too
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(os.getcwd(), "result_cache.sqlite3"))
+
+# Results that depend on the clock, randomness or sequences must never be served from cache.
+# sqlglot parses the common ones (now(), current_date, random(), gen_random_uuid(), ...)
+# into dedicated node types; everything else shows up as an anonymous function by name.
+VOLATILE_EXPRESSIONS = tuple(
+    getattr(exp, name) for name in (
+        "CurrentTimestamp", "CurrentDate", "CurrentTime", "CurrentDatetime",
+        "Localtime", "Localtimestamp", "Rand", "Uuid",
+    ) if hasattr(exp, name)
+)
+VOLATILE_FUNCTIONS = {
+    "now", "random", "setseed", "clock_timestamp", "statement_timestamp", "transaction_timestamp",
+    "timeofday", "gen_random_uuid", "uuid_generate_v1", "uuid_generate_v4", "nextval", "currval",
+    "lastval", "txid_current", "pg_backend_pid",
+}
+
+
+def is_volatile(tree) -> bool:
+    """
+    True if the parsed query calls anything whose result changes between runs.
+    age(x) with a single argument is measured from now; age(a, b) is deterministic.
+    """
+    for node in tree.find_all(exp.Func):
+        if isinstance(node, VOLATILE_EXPRESSIONS):
+            return True
+        if isinstance(node, exp.Anonymous):
+            name = node.name.lower()
+            if name in VOLATILE_FUNCTIONS or (name == "age" and len(node.expressions) == 1):
+                return True
+    return False
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a query so different phrasings of the same SQL share a cache entry.
+    Returned as-is (trimmed) if sqlglot can't parse it: case and spacing inside string
+    literals can't be told apart from the rest without a parse.
+    """
+    try:
+        return sqlglot.parse_one(sql, read="postgres").sql(dialect="postgres", normalize=True)
+    except Exception:
+        return sql.strip().rstrip(";")
+
+
+def cache_key(sql: str, db_url: str = None):
+    """
+    Returns the cache key for a query on a database, or None if the query must not be cached.
+    Queries sqlglot can't parse are not cached, since neither their volatility nor a
+    safe canonical form can be worked out.
+    """
+    try:
+        tree = sqlglot.parse_one(sql, read="postgres")
+    except Exception:
+        metrics.incr("result_cache.unparsed")
+        return None
+    if is_volatile(tree):
+        return None
+    normalized = tree.sql(dialect="postgres", normalize=True)
+    target = db_url or os.getenv("DATABASE_URL") or ""
+    return f"{hashlib.sha1(target.encode('utf-8')).hexdigest()[:12]}:{normalized}"
+
+
+def _encode(columns: list, rows: list) -> bytes:
+    # Column-major layout: one list of values per column, then compressed
+    data = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+    payload = json.dumps({"c": columns, "v": data}, separators=(",", ":"), default=str)
+    return zlib.compress(payload.encode("utf-8"), 1)
+
+
+def _decode(blob: bytes):
+    payload = json.loads(zlib.decompress(blob))
+    columns = payload["c"]
+    rows = [tuple(row) for row in zip(*payload["v"])] if payload["v"] and payload["v"][0] else []
+    return columns, rows
+
+
+class ResultCache:
+    """
+    LRU cache of query results bounded by total serialized size, with a TTL per entry.
+    Entries are stored as compressed column-major JSON instead of lists of dicts.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (blob, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        blob, _ = self._entries.pop(key)
+        self._bytes -= len(blob)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.incr("result_cache.misses")
+                return None
+            blob, expires_at = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                metrics.incr("result_cache.expired")
+                metrics.incr("result_cache.misses")
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr("result_cache.hits")
+        return _decode(blob)
+
+    def put(self, key, columns: list, rows: list, ttl_seconds: float = None):
+        blob = _encode(columns, rows)
+        # A single huge result would evict everything else; don't cache it
+        if len(blob) > self.max_bytes // 4:
+            metrics.incr("result_cache.too_large")
+            return
+
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (blob, expires_at)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                metrics.incr("result_cache.evictions")
+
+    def invalidate(self, db_url: str = None):
+        """
+        Drops every entry for `db_url`, or the whole cache when no URL is given.
+        Called whenever seed or uploaded data changes.
+        """
+        with self._lock:
+            if db_url is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            prefix = hashlib.sha1(db_url.encode("utf-8")).hexdigest()[:12] + ":"
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, "backend": "memory"}
+
+
+class SqliteResultCache:
+    """
+    Same interface as ResultCache, stored in a local SQLite file (WAL mode) so every
+    worker process on the host shares entries, the size budget and invalidations.
+    Wall-clock time is used for TTLs because entries outlive any single process.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, blob BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access)")
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT blob, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            metrics.incr("result_cache.misses")
+            return None
+        blob, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            metrics.incr("result_cache.expired")
+            metrics.incr("result_cache.misses")
+            return None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        metrics.incr("result_cache.hits")
+        return _decode(blob)
+
+    def put(self, key, columns: list, rows: list, ttl_seconds: float = None):
+        blob = _encode(columns, rows)
+        if len(blob) > self.max_bytes // 4:
+            metrics.incr("result_cache.too_large")
+            return
+
+        now = time.time()
+        expires_at = now + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, blob, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), expires_at, now)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            # Evict least recently used entries until we're back under budget
+            while total > self.max_bytes:
+                victim = conn.execute("SELECT key, size FROM results ORDER BY last_access LIMIT 1").fetchone()
+                if victim is None:
+                    break
+                conn.execute("DELETE FROM results WHERE key = ?", (victim[0],))
+                total -= victim[1]
+                metrics.incr("result_cache.evictions")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def invalidate(self, db_url: str = None):
+        conn = self._conn()
+        if db_url is None:
+            conn.execute("DELETE FROM results")
+            return
+        prefix = hashlib.sha1(db_url.encode("utf-8")).hexdigest()[:12] + ":"
+        conn.execute("DELETE FROM results WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def stats(self) -> dict:
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, "backend": "sqlite"}
+
+
+def _create_cache():
+    if RESULT_CACHE_BACKEND == "sqlite":
+        return SqliteResultCache()
+    return ResultCache()
+
+
+# Process-wide cache used by the executor (shared across workers with RESULT_CACHE_BACKEND=sqlite)
+result_cache = _create_cache()
+
+
+def invalidate_results(db_url: str = None):
+    """
+    Invalidation hook for code paths that change data (seeding, uploads).
+    """
+    result_cache.invalidate(db_url)
+    metrics.incr("result_cache.invalidations")
@@ -0,0 +1,178 @@
+import os
+import hashlib
+from app.services.database import get_db_connection
+
+# Bookkeeping table in the target DB: one row per seed file with the checksum last applied
+SEED_TABLE = "_querymind_seeds"
+
+# Statements are sent to Postgres in batches of roughly this many bytes per round trip
+SEED_BATCH_BYTES = int(os.getenv("SEED_BATCH_BYTES", str(256 * 1024)))
+
+# Arbitrary constant for pg_advisory_xact_lock so concurrent workers don't seed at the same time
+SEED_LOCK_ID = 4207311
+
+
+def split_sql_statements(sql: str) -> list:
+    """
+    Splits a SQL script on top-level semicolons.
+    Semicolons inside quoted strings (including E'...' escape strings), quoted
+    identifiers, dollar-quoted bodies ($$ ... $$ / $tag$ ... $tag$) and comments are left alone.
+    """
+    statements = []
+    current = []
+    i = 0
+    n = len(sql)
+
+    while i < n:
+        ch = sql[i]
+
+        # -- line comment
+        if ch == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = n if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+            continue
+
+        # /* block comment */
+        if ch == "/" and sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+            continue
+
+        # 'string' or "identifier" (a doubled quote is an escaped quote).
+        # In E'...' escape strings a backslash escapes the next character too.
+        if ch in ("'", '"'):
+            backslash_escapes = (
+                ch == "'" and i > 0 and sql[i - 1] in "eE"
+                and (i < 2 or not (sql[i - 2].isalnum() or sql[i - 2] == "_"))
+            )
+            j = i + 1
+            while j < n:
+                if backslash_escapes and sql[j] == "\\":
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            current.append(sql[i:j + 1])
+            i = j + 1
+            continue
+
+        # $tag$ dollar-quoted body $tag$
+        if ch == "$":
+            j = i + 1
+            while j < n and (sql[j].isalnum() or sql[j] == "_"):
+                j += 1
+            if j < n and sql[j] == "$" and not sql[i + 1:j][:1].isdigit():
+                tag = sql[i:j + 1]
+                end = sql.find(tag, j + 1)
+                end = n if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+
+        if ch == ";":
+            statement = "".join(current).strip()
+            if _has_code(statement):
+                statements.append(statement)
+            current = []
+            i += 1
+            continue
+
+        current.append(ch)
+        i += 1
+
+    statement = "".join(current).strip()
+    if _has_code(statement):
+        statements.append(statement)
+    return statements
+
+
+def _has_code(statement: str) -> bool:
+    """
+    False for fragments that are only whitespace and comments.
+    """
+    lines = [line for line in statement.splitlines() if line.strip() and not line.strip().startswith("--")]
+    return bool(lines) and not all(line.strip().startswith("/*") and line.strip().endswith("*/") for line in lines)
+
+
+def batch_statements(statements: list, max_bytes: int = SEED_BATCH_BYTES) -> list:
+    """
+    Groups consecutive statements into scripts of at most ~max_bytes so each batch
+    costs one round trip instead of one per statement. Separators go on their own
+    line, so a statement ending in a -- comment can't comment out the ";".
+    """
+    batches = []
+    current = []
+    size = 0
+    for statement in statements:
+        if current and size + len(statement) > max_bytes:
+            batches.append("\n;\n".join(current) + "\n;")
+            current, size = [], 0
+        current.append(statement)
+        size += len(statement)
+    if current:
+        batches.append("\n;\n".join(current) + "\n;")
+    return batches
+
+
+def file_checksum(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def seed_database(db_url: str, seed_path: str) -> str:
+    """
+    Applies a seed file to `db_url` in a single transaction.
+    Skips entirely when the file's checksum matches the one recorded in the target DB.
+    Returns "skipped" or "seeded"; raises on failure after rolling back, so a failed
+    seed never leaves half-seeded state behind.
+    """
+    seed_name = os.path.basename(seed_path)
+    checksum = file_checksum(seed_path)
+
+    conn = get_db_connection(db_url)
+    if not conn:
+        raise ConnectionError(f"Failed to connect to target DB {db_url}")
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (SEED_LOCK_ID,))
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEED_TABLE} ("
+            "seed_name TEXT PRIMARY KEY, checksum TEXT NOT NULL, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        cur.execute(f"SELECT checksum FROM {SEED_TABLE} WHERE seed_name = %s", (seed_name,))
+        row = cur.fetchone()
+        if row and row[0] == checksum:
+            conn.rollback()
+            return "skipped"
+
+        with open(seed_path, "r", encoding="utf-8") as f:
+            statements = split_sql_statements(f.read())
+
+        for batch in batch_statements(statements):
+            cur.execute(batch)
+
+        cur.execute(
+            f"INSERT INTO {SEED_TABLE} (seed_name, checksum) VALUES (%s, %s) "
+            "ON CONFLICT (seed_name) DO UPDATE SET checksum = EXCLUDED.checksum, applied_at = now()",
+            (seed_name, checksum)
+        )
+        conn.commit()
+        cur.close()
+        print(f"Applied seed {seed_name} ({len(statements)} statements)")
+        return "seeded"
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from app.services.metrics import metrics
+
+# Conversation state kept between /query turns: how many sessions, and how long an idle one lives
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# memory (per worker process) or sqlite (shared by all workers on the host); follows
+# RESULT_CACHE_BACKEND unless set, since both need the same multi-worker setup
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", os.getenv("RESULT_CACHE_BACKEND", "memory")).lower()
+SESSION_PATH = os.getenv("SESSION_PATH", os.path.join(os.getcwd(), "sessions.sqlite3"))
+
+
+class SessionStore:
+    """
+    LRU map of (user_id, session_id) -> previous turn, with an idle TTL per entry.
+    Only the small parts of the agent state are kept (schema context, SQL and a
+    result digest), never the full result rows.
+    State is per worker process; with several workers use SqliteSessionStore
+    (SESSION_BACKEND=sqlite), or follow-ups that land on a different worker start fresh.
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (turn, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id, session_id: str):
+        key = (user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.incr("sessions.misses")
+                return None
+            turn, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                metrics.incr("sessions.expired")
+                metrics.incr("sessions.misses")
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr("sessions.hits")
+        return dict(turn)
+
+    def put(self, user_id, session_id: str, turn: dict):
+        key = (user_id, session_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (dict(turn), time.monotonic() + self.ttl_seconds)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr("sessions.evictions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds, "backend": "memory"}
+
+
+class SqliteSessionStore:
+    """
+    Same interface as SessionStore, stored in a local SQLite file (WAL mode) so a
+    follow-up finds its previous turn whichever worker it lands on.
+    Wall-clock time is used for TTLs because entries outlive any single process.
+    """
+
+    def __init__(self, path: str = SESSION_PATH, max_entries: int = SESSION_MAX_ENTRIES, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id TEXT NOT NULL, session_id TEXT NOT NULL, turn TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (user_id, session_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)")
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id, session_id: str):
+        conn = self._conn()
+        key = (str(user_id), session_id)
+        now = time.time()
+        row = conn.execute("SELECT turn, expires_at FROM sessions WHERE user_id = ? AND session_id = ?", key).fetchone()
+        if row is None:
+            metrics.incr("sessions.misses")
+            return None
+        turn, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM sessions WHERE user_id = ? AND session_id = ?", key)
+            metrics.incr("sessions.expired")
+            metrics.incr("sessions.misses")
+            return None
+        conn.execute("UPDATE sessions SET last_access = ? WHERE user_id = ? AND session_id = ?", (now,) + key)
+        metrics.incr("sessions.hits")
+        return json.loads(turn)
+
+    def put(self, user_id, session_id: str, turn: dict):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, session_id, turn, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (str(user_id), session_id, json.dumps(turn), now + self.ttl_seconds, now)
+            )
+            count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            if count > self.max_entries:
+                # Evict least recently used sessions until we're back under the cap
+                conn.execute(
+                    "DELETE FROM sessions WHERE rowid IN (SELECT rowid FROM sessions ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                metrics.incr("sessions.evictions", count - self.max_entries)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict:
+        sessions = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"sessions": sessions, "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds, "backend": "sqlite"}
+
+
+def _create_store():
+    if SESSION_BACKEND == "sqlite":
+        return SqliteSessionStore()
+    return SessionStore()
+
+
+# Shared session store for /query (shared across workers with SESSION_BACKEND=sqlite)
+session_store = _create_store()
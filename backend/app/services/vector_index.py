@@ -0,0 +1,295 @@
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+# Upserts compact the numpy index once this many rows are shadowed by newer copies of their id
+NUMPY_INDEX_COMPACT_SHADOWED = int(os.getenv("NUMPY_INDEX_COMPACT_SHADOWED", "256"))
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive cross-process lock on `path` (flock), used to keep a single writer per index.
+    """
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ChromaIndex:
+    """
+    Vector index backed by a persistent Chroma collection (the default backend).
+    """
+
+    def __init__(self, path: str, collection_name: str = "schema_metadata"):
+        import chromadb
+
+        # Initialize ChromaDB (Persistent means it saves to disk)
+        self.client = chromadb.PersistentClient(path=path)
+
+        # Create (or get) a collection named "schema_metadata"
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self._lock_path = os.path.join(path, ".writer.lock")
+
+    def upsert(self, ids: list, embeddings, documents: list, metadatas: list):
+        # Chroma's on-disk store is not safe for concurrent writers from several processes
+        with file_lock(self._lock_path):
+            self.collection.upsert(
+                documents=documents,
+                embeddings=[list(map(float, e)) for e in embeddings],
+                metadatas=metadatas,
+                ids=ids
+            )
+
+    def query(self, embedding, n_results: int = 3, where: dict = None) -> list:
+        results = self.collection.query(
+            query_embeddings=[list(map(float, embedding))],
+            n_results=n_results,
+            where=where or None
+        )
+        return results['documents'][0] if results['documents'] else []
+
+
+class NumpyVectorIndex:
+    """
+    In-process brute-force cosine index for small corpora (thousands of tables).
+
+    Layout in `path`:
+      manifest.json        {"dim", "count", "meta_bytes", "shadowed", "generation"}; replaced atomically, so readers
+                           only ever see fully written rows
+      vectors.<gen>.f32    float32 L2-normalized embeddings, memory-mapped for reads
+      meta.<gen>.jsonl     one {"id", "document", "metadata"} line per vector row
+
+    Writers (append/compact) serialize on an flock, so several uvicorn workers can
+    share one directory; readers never lock and pick up new rows via the manifest.
+    Re-adding an id appends a new row that shadows the old one until `compact()`, which
+    upsert runs by itself once `compact_shadowed` rows are shadowed. Compaction keeps the
+    previous generation's files (deleting the one before), so a reader that has just read
+    the old manifest can still open them.
+    """
+
+    def __init__(self, path: str, compact_shadowed: int = NUMPY_INDEX_COMPACT_SHADOWED):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock_path = os.path.join(path, ".lock")
+        self._manifest_path = os.path.join(path, "manifest.json")
+        self.compact_shadowed = compact_shadowed
+        self._local_lock = threading.Lock()
+        self._loaded_manifest = None
+        self._vectors = None
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._active = None
+
+    # --- file helpers ---
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors.{generation}.f32")
+
+    def _meta_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"meta.{generation}.jsonl")
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": None, "count": 0, "meta_bytes": 0, "shadowed": 0, "generation": 0}
+
+    def _write_manifest(self, manifest: dict):
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._manifest_path)
+
+    # --- reads ---
+
+    def _refresh(self, attempts: int = 3):
+        """
+        Reloads the memory map and sidecar if another writer (or process) changed the manifest.
+        If a compaction removed the files between reading the manifest and opening them,
+        the manifest is read again and the load retried.
+        """
+        for attempt in range(attempts):
+            manifest = self._read_manifest()
+            if manifest == self._loaded_manifest:
+                return
+            try:
+                self._load(manifest)
+                return
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+
+    def _load(self, manifest: dict):
+        with self._local_lock:
+            count, dim, generation = manifest["count"], manifest["dim"], manifest["generation"]
+            if count == 0:
+                vectors = np.zeros((0, dim or 0), dtype=np.float32)
+                ids, documents, metadatas = [], [], []
+            else:
+                vectors = np.memmap(self._vectors_path(generation), dtype=np.float32, mode="r", shape=(count, dim))
+                ids, documents, metadatas = [], [], []
+                with open(self._meta_path(generation), "r", encoding="utf-8") as f:
+                    for _, line in zip(range(count), f):
+                        row = json.loads(line)
+                        ids.append(row["id"])
+                        documents.append(row["document"])
+                        metadatas.append(row["metadata"])
+
+            # Only the newest row per id is live
+            active = np.zeros(len(ids), dtype=bool)
+            seen = set()
+            for i in range(len(ids) - 1, -1, -1):
+                if ids[i] not in seen:
+                    seen.add(ids[i])
+                    active[i] = True
+
+            self._vectors, self._ids, self._documents, self._metadatas = vectors, ids, documents, metadatas
+            self._active = active
+            self._loaded_manifest = manifest
+
+    def _snapshot(self):
+        # A concurrent _refresh replaces these together; never mix two generations
+        with self._local_lock:
+            return self._vectors, self._documents, self._metadatas, self._active
+
+    def __len__(self) -> int:
+        self._refresh()
+        return int(self._snapshot()[3].sum())
+
+    def query(self, embedding, n_results: int = 3, where: dict = None) -> list:
+        """
+        Returns the documents of the top `n_results` rows by cosine similarity,
+        optionally restricted to rows whose metadata matches every key in `where`.
+        """
+        self._refresh()
+        vectors, documents, metadatas, active = self._snapshot()
+        if not documents:
+            return []
+
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        mask = active
+        if where:
+            mask = mask & np.fromiter(
+                (all(m.get(k) == v for k, v in where.items()) for m in metadatas),
+                dtype=bool, count=len(metadatas)
+            )
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+
+        scores = vectors[candidates] @ q
+        k = min(n_results, candidates.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [documents[candidates[i]] for i in top]
+
+    # --- writes ---
+
+    def upsert(self, ids: list, embeddings, documents: list, metadatas: list):
+        """
+        Appends rows under the writer lock, then publishes them by rewriting the manifest.
+        Compacts afterwards if too many rows are shadowed.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+        with file_lock(self._lock_path):
+            manifest = self._read_manifest()
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vectors.shape[1])
+            elif manifest["dim"] != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {manifest['dim']}")
+
+            # Rows whose id is already in the index (or repeats within this batch) shadow older rows
+            self._refresh()
+            known = set(self._ids)
+            shadowed = manifest.get("shadowed", len(self._ids) - len(known))
+            for i in ids:
+                if i in known:
+                    shadowed += 1
+                known.add(i)
+
+            generation, count = manifest["generation"], manifest["count"]
+            # Truncate any rows a crashed writer left past the published count
+            self._append(self._vectors_path(generation), vectors.tobytes(), count * manifest["dim"] * 4)
+            lines = "".join(
+                json.dumps({"id": i, "document": d, "metadata": m or {}}) + "\n"
+                for i, d, m in zip(ids, documents, metadatas)
+            )
+            data = lines.encode("utf-8")
+            meta_bytes = manifest.get("meta_bytes", 0)
+            self._append(self._meta_path(generation), data, meta_bytes)
+
+            manifest["count"] = count + len(ids)
+            manifest["meta_bytes"] = meta_bytes + len(data)
+            manifest["shadowed"] = shadowed
+            self._write_manifest(manifest)
+
+            if self.compact_shadowed > 0 and shadowed >= self.compact_shadowed:
+                self._compact_locked()
+
+    @staticmethod
+    def _append(path: str, data: bytes, offset: int):
+        with open(path, "ab") as f:
+            f.truncate(offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self):
+        """
+        Rewrites the index without shadowed rows into a new generation, then swaps the manifest.
+        Readers holding the old memory map keep working until they refresh.
+        """
+        with file_lock(self._lock_path):
+            self._compact_locked()
+
+    def _compact_locked(self):
+        # Caller holds the writer lock (flock isn't re-entrant across file descriptors)
+        with self._local_lock:
+            self._loaded_manifest = None
+        self._refresh()
+        with self._local_lock:
+            manifest = dict(self._loaded_manifest)
+            vectors, ids, documents, metadatas, active = self._vectors, self._ids, self._documents, self._metadatas, self._active
+        old_generation = manifest["generation"]
+        keep = np.flatnonzero(active)
+        new_generation = old_generation + 1
+
+        with open(self._vectors_path(new_generation), "wb") as f:
+            f.write(np.ascontiguousarray(vectors[keep]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        lines = "".join(
+            json.dumps({"id": ids[i], "document": documents[i], "metadata": metadatas[i]}) + "\n"
+            for i in keep
+        ).encode("utf-8")
+        with open(self._meta_path(new_generation), "wb") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        manifest.update({"count": int(keep.size), "generation": new_generation, "meta_bytes": len(lines), "shadowed": 0})
+        self._write_manifest(manifest)
+
+        # Keep the generation we just replaced: readers may have read its manifest a moment ago.
+        # The one before it has been unreferenced for a whole compaction cycle.
+        for path in (self._vectors_path(old_generation - 1), self._meta_path(old_generation - 1)):
+            if os.path.exists(path):
+                os.remove(path)
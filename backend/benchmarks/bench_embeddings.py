@@ -0,0 +1,129 @@
+"""
+Embedding runtime benchmark: PyTorch (sentence-transformers) vs int8 ONNX.
+
+1. Accuracy: embeds the sample schema (database/docker-init/02_sample_complex_seed.sql)
+   the same way VectorService.add_table_context does, runs a set of sample
+   questions through both backends and compares the top-k table rankings.
+2. Latency / memory: each backend runs in its own subprocess and reports model
+   load time, single-query encode p50/p95, and peak RSS.
+
+Usage (from backend/, after `python -m app.services.embeddings export`):
+    python benchmarks/bench_embeddings.py --top-k 3 --repeats 200
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+SEED_PATH = os.path.join(os.path.dirname(BACKEND_DIR), "database", "docker-init", "02_sample_complex_seed.sql")
+
+QUESTIONS = [
+    "How many customers do we have?",
+    "What is the total revenue per store?",
+    "Which products are low on stock?",
+    "Show the average rating for each product",
+    "Which supplier provides the most products?",
+    "How many orders were returned and why?",
+    "What payment methods are used most often?",
+    "List shipments by carrier",
+    "Which employees work at the Downtown store?",
+    "What promotions were active in January?",
+    "Top 5 best selling products by quantity",
+    "Revenue by product category",
+]
+
+
+def schema_documents() -> dict:
+    import services
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        blocks = services.parse_sql_blocks(f.read())
+    docs = {}
+    for ddl in blocks:
+        m = re.search(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"]?([A-Za-z0-9_]+)', ddl, flags=re.IGNORECASE)
+        if m:
+            name = m.group(1)
+            docs[name] = f"Table: {name}\nDescription: Sample schema\nSchema: {ddl}"
+    return docs
+
+
+def run_child(backend: str, repeats: int, top_k: int) -> dict:
+    import numpy as np
+    from app.services.embeddings import load_embedding_model
+
+    start = time.perf_counter()
+    model = load_embedding_model(backend)
+    load_s = time.perf_counter() - start
+
+    docs = schema_documents()
+    names = list(docs)
+    doc_vectors = np.asarray(model.encode([docs[n] for n in names]), dtype=np.float32)
+    rankings = {}
+    for q in QUESTIONS:
+        scores = doc_vectors @ np.asarray(model.encode(q), dtype=np.float32)
+        rankings[q] = [names[i] for i in np.argsort(-scores)[:top_k]]
+
+    latencies = []
+    for i in range(repeats):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        start = time.perf_counter()
+        model.encode(question)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 3),
+        "encode_p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "encode_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "torch_imported": "torch" in sys.modules,
+        "rankings": rankings,
+    }
+
+
+def compare(reference: dict, candidate: dict) -> dict:
+    top1 = sum(reference[q][0] == candidate[q][0] for q in QUESTIONS)
+    overlap = statistics.mean(len(set(reference[q]) & set(candidate[q])) / len(reference[q]) for q in QUESTIONS)
+    return {"top1_agreement": round(top1 / len(QUESTIONS), 3), "mean_topk_overlap": round(overlap, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--min-top1", type=float, default=0.9, help="Fail if ONNX top-1 agreement falls below this")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.repeats, args.top_k)))
+        return
+
+    results = {}
+    for backend in ("torch", "onnx"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--repeats", str(args.repeats), "--top-k", str(args.top_k)],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(json.dumps({"backend": backend, "error": proc.stderr.strip().splitlines()[-1:]}))
+            sys.exit(1)
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    accuracy = compare(results["torch"]["rankings"], results["onnx"]["rankings"])
+    for backend, result in results.items():
+        result.pop("rankings")
+        print(json.dumps(result))
+    print(json.dumps({"accuracy": accuracy}))
+    sys.exit(0 if accuracy["top1_agreement"] >= args.min_top1 else 1)
+
+
+if __name__ == "__main__":
+    main()
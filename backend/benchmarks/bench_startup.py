@@ -0,0 +1,78 @@
+"""
+Startup budget benchmark.
+
+Measures, in fresh subprocesses, how long `import main` takes and how long the
+warmup phase (agent graph + embedding model + Chroma) takes, and compares both
+against a budget. Exits non-zero when a budget is exceeded so it can gate CI.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py --runs 5 --import-budget 1.5 --warmup-budget 30
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time, json
+start = time.perf_counter()
+import main
+print(json.dumps({"import": time.perf_counter() - start}))
+"""
+
+WARMUP_SNIPPET = """
+import time, json
+from app.agents import runtime
+start = time.perf_counter()
+runtime.warmup()
+state = runtime.readiness()
+print(json.dumps({"warmup": time.perf_counter() - start, "status": state["status"], "steps": state["steps"]}))
+"""
+
+
+def _run(snippet: str) -> dict:
+    env = dict(os.environ)
+    # config.Settings requires these; the benchmark never talks to the database
+    env.setdefault("DATABASE_URL", "sqlite:///./bench_startup.db")
+    env.setdefault("SECRET_KEY", "bench")
+    env.setdefault("DB_USER", "bench")
+    env.setdefault("DB_PASSWORD", "bench")
+    env.setdefault("LLM_PROVIDER", "stub")
+    # Report a broken warmup instead of retrying it forever
+    env.setdefault("WARMUP_MAX_ATTEMPTS", "1")
+    out = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "1.5")))
+    parser.add_argument("--warmup-budget", type=float, default=float(os.getenv("STARTUP_WARMUP_BUDGET_SECONDS", "30")))
+    parser.add_argument("--skip-warmup", action="store_true", help="Only measure the import of main")
+    args = parser.parse_args()
+
+    imports = [_run(IMPORT_SNIPPET)["import"] for _ in range(args.runs)]
+    report = {"import_median_s": round(statistics.median(imports), 3), "import_budget_s": args.import_budget}
+    ok = report["import_median_s"] <= args.import_budget
+
+    if not args.skip_warmup:
+        warm = _run(WARMUP_SNIPPET)
+        report.update({"warmup_s": round(warm["warmup"], 3), "warmup_status": warm["status"],
+                       "warmup_steps": warm["steps"], "warmup_budget_s": args.warmup_budget})
+        ok = ok and warm["status"] == "ready" and warm["warmup"] <= args.warmup_budget
+
+    report["within_budget"] = ok
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Vector index benchmark: NumPy memory-mapped index vs Chroma.
+
+Each backend runs in its own subprocess so RSS numbers are not polluted by the
+other. Embeddings are random unit vectors of the model's size (384), which is
+enough to compare index overhead without loading the embedding model.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_index.py --docs 5000 --queries 500
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DIM = 384
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend: str, docs: int, queries: int, batch: int) -> dict:
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(docs, DIM)).astype(np.float32)
+    probes = rng.normal(size=(queries, DIM)).astype(np.float32)
+    path = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    rss_before = _rss_mb()
+
+    try:
+        if backend == "numpy":
+            from app.services.vector_index import NumpyVectorIndex
+            index = NumpyVectorIndex(path)
+        else:
+            from app.services.vector_index import ChromaIndex
+            index = ChromaIndex(path, collection_name="bench")
+
+        start = time.perf_counter()
+        for i in range(0, docs, batch):
+            ids = [f"table_{j}" for j in range(i, min(i + batch, docs))]
+            index.upsert(
+                ids=ids,
+                embeddings=vectors[i:i + len(ids)],
+                documents=[f"Table: {t}\nSchema: CREATE TABLE {t} (id INT);" for t in ids],
+                metadatas=[{"table_name": t} for t in ids]
+            )
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        for probe in probes:
+            start = time.perf_counter()
+            index.query(probe, n_results=3)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+
+        return {
+            "backend": backend,
+            "docs": docs,
+            "build_s": round(build_s, 3),
+            "query_p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+            "rss_delta_mb": round(_rss_mb() - rss_before, 1),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--backends", default="numpy,chroma")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.docs, args.queries, args.batch)))
+        return
+
+    for backend in args.backends.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--docs", str(args.docs),
+             "--queries", str(args.queries), "--batch", str(args.batch)],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(json.dumps({"backend": backend, "error": proc.stderr.strip().splitlines()[-1:]}))
+            continue
+        print(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
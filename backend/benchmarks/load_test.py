@@ -0,0 +1,226 @@
+"""
+End-to-end /query load test against a locally launched backend.
+
+For each worker count it starts `uvicorn main:app --workers N` with the stub LLM
+(so no API key or network is needed), logs in as the dev test user, then keeps
+`--concurrency` clients issuing /query for `--duration` seconds. It reports
+throughput and latency per worker count and the scaling efficiency relative
+to one worker (1.0 = perfectly linear).
+
+By default (worker-scaling mode) every client gets its own account and the admission
+caps and LLM_MAX_CONCURRENCY are raised to the client count, so the numbers measure
+worker scaling rather than ADMISSION_MAX_PER_USER / ADMISSION_MAX_INFLIGHT or the
+per-provider LLM semaphore.
+
+Workers share one model server (app.services.model_server, started here unless
+VECTOR_SERVICE_URL is already set), as in the multi-worker deployment, so the embedding
+model is loaded once rather than once per worker.
+
+With `--users N` the clients are spread over N separate accounts and the server keeps
+its configured admission caps. The report adds the 429 shed count and Jain's fairness
+index over per-user completions (1.0 = every user got the same share), to check
+admission control fairness.
+
+Needs a reachable Postgres in DATABASE_URL (and AGENT_DATABASE_URL for the demo data).
+
+Usage (from backend/):
+    python benchmarks/load_test.py --workers 1,2,4 --concurrency 16 --duration 30
+    python benchmarks/load_test.py --workers 1 --concurrency 40 --users 10
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import statistics
+import subprocess
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "How many customers do we have?",
+    "How many orders were placed?",
+    "How many products are active?",
+    "How many stores are there?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_ok(proc: subprocess.Popen, url: str, timeout: float, what: str):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"{what} did not become ready")
+
+
+def start_model_server(port: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.services.model_server", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _wait_until_ok(proc, f"http://127.0.0.1:{port}/healthz", 300, "Model server")
+    return proc
+
+
+def start_server(workers: int, port: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _wait_until_ok(proc, f"http://127.0.0.1:{port}/readyz", 120, f"Server with {workers} workers")
+    return proc
+
+
+def login(base: str, username: str, password: str) -> str:
+    response = requests.post(f"{base}/token", data={"username": username, "password": password}, timeout=10)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def ensure_user(base: str, username: str, password: str) -> str:
+    """
+    Creates the account if needed and returns a bearer token for it.
+    """
+    requests.post(f"{base}/create_user", json={"email": username, "password": password, "full_name": username}, timeout=10)
+    return login(base, username, password)
+
+
+def jain_fairness(values: list) -> float:
+    if not values or not any(values):
+        return 0.0
+    return round(sum(values) ** 2 / (len(values) * sum(v * v for v in values)), 3)
+
+
+def run_load(base: str, tokens: list, concurrency: int, duration: float) -> dict:
+    """
+    Client i uses tokens[i % len(tokens)], so several tokens simulate several users.
+    Returns throughput, latency percentiles and per-user completion counts.
+    """
+    latencies, statuses, per_user = [], {}, {}
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(i: int):
+        session = requests.Session()
+        user = i % len(tokens)
+        headers = {"Authorization": f"Bearer {tokens[user]}"}
+        n = 0
+        while time.time() < stop_at:
+            question = QUESTIONS[(i + n) % len(QUESTIONS)]
+            start = time.perf_counter()
+            try:
+                code = session.post(f"{base}/query", json={"question": question}, headers=headers, timeout=120).status_code
+            except requests.RequestException:
+                code = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[code] = statuses.get(code, 0) + 1
+                if code == 200:
+                    latencies.append(elapsed)
+                    per_user[user] = per_user.get(user, 0) + 1
+            n += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 1) if latencies else None,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "per_user_completed": per_user,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--users", type=int, default=None,
+                        help="Spread clients over this many accounts and keep the server's admission caps "
+                             "(default: one account per client, caps lifted)")
+    parser.add_argument("--stub-latency-ms", type=int, default=200, help="Simulated LLM latency")
+    args = parser.parse_args()
+    scaling_mode = args.users is None
+    if scaling_mode:
+        args.users = args.concurrency
+
+    username = os.getenv("DEV_TEST_USERNAME", "loadtest@example.com")
+    password = os.getenv("DEV_TEST_PASSWORD", "loadtest-password")
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": str(args.stub_latency_ms),
+        "DEV_TEST_USERNAME": username,
+        "DEV_TEST_PASSWORD": password,
+        # Share caches between workers, as in a real multi-worker deployment
+        "RESULT_CACHE_BACKEND": env.get("RESULT_CACHE_BACKEND", "sqlite"),
+    })
+    if scaling_mode:
+        # Admission caps and the LLM semaphore are per worker; left at their defaults
+        # they, not the worker count, would bound in-flight requests and fake near-linear scaling
+        env.update({
+            "ADMISSION_MAX_INFLIGHT": str(args.concurrency),
+            "ADMISSION_MAX_PER_USER": str(args.concurrency),
+            "ADMISSION_MAX_QUEUE": str(args.concurrency),
+            "LLM_MAX_CONCURRENCY": str(args.concurrency),
+        })
+
+    model_server = None
+    if not env.get("VECTOR_SERVICE_URL"):
+        model_port = _free_port()
+        model_server = start_model_server(model_port, env)
+        env["VECTOR_SERVICE_URL"] = f"http://127.0.0.1:{model_port}"
+
+    report = []
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            port = _free_port()
+            proc = start_server(workers, port, env)
+            try:
+                base = f"http://127.0.0.1:{port}"
+                tokens = [login(base, username, password)]
+                tokens += [ensure_user(base, f"loadtest{u}@example.com", password) for u in range(1, args.users)]
+                result = run_load(base, tokens, args.concurrency, args.duration)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            result["workers"] = workers
+            result["shed_429"] = result["statuses"].get("429", 0)
+            result["fairness"] = jain_fairness([result["per_user_completed"].get(u, 0) for u in range(args.users)])
+            report.append(result)
+            print(json.dumps(result))
+    finally:
+        if model_server is not None:
+            model_server.terminate()
+            model_server.wait(timeout=30)
+
+    baseline = report[0]["throughput_rps"] / report[0]["workers"] if report and report[0]["throughput_rps"] else None
+    if baseline:
+        for r in report:
+            r["scaling_efficiency"] = round(r["throughput_rps"] / (baseline * r["workers"]), 2)
+        print(json.dumps({"scaling_efficiency": {r["workers"]: r["scaling_efficiency"] for r in report}}))
+
+
+if __name__ == "__main__":
+    main()
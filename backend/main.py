@@ -1,15 +1,23 @@
 import os
-from io import BytesIO
-import pandas as pd
-from datetime import timedelta
-
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status
+import json
+import time
+import asyncio
+from contextlib import AsyncExitStack
+import base64
+from datetime import datetime, timedelta
+
+# Measured from the first line so /readyz and the startup benchmark can report it
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, func, tuple_
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 
 # --- IMPORTS ---
 import models   # Your DB Tables
@@ -18,23 +26,38 @@ import auth     # Your JWT Logic
 import utils    # Your Password Hashing
 from db import engine, get_db, SessionLocal
 import services
+import migrations
+from app.services.metrics import metrics
+from app.services.admission import admission, Overloaded
+from app.services.sessions import session_store
 
 # --- AGENT IMPORTS ---
-try:
-    from app.agents.graph import build_graph
-    from app.services.rag import VectorService
-    from app.services.database import execute_query as agent_execute_query
-    AGENT_AVAILABLE = True
-except ImportError:
+# Only lightweight modules are imported here. langgraph, langchain, torch and chromadb
+# are loaded by the background warmup task (or lazily by the first request).
+from app.agents import runtime
+AGENT_AVAILABLE = runtime.agent_available()
+if AGENT_AVAILABLE:
+    from app.agents.router import routing_stats
+    from app.services.rag import get_vector_service
+    from app.services.result_cache import result_cache, invalidate_results
+    from app.services.export import EXPORT_FORMATS, ExportError
+    from app.agents.followups import result_digest
+else:
     print("⚠️  Warning: Agent services not available. Query endpoint disabled.")
-    AGENT_AVAILABLE = False
-
-# Setup DB
-models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(docs_url="/",root_path="/api", redoc_url=None)
 
 
+@app.on_event("startup")
+def create_tables():
+    """
+    Creates any missing tables. Runs at startup rather than at import so importing `main` stays cheap.
+    """
+    # create_all never alters existing tables; indexes etc. added later are applied as
+    # migrations. Both run in one transaction under the migration lock.
+    migrations.run_migrations(engine, models.Base.metadata)
+
+
 @app.on_event("startup")
 def ensure_test_user():
     """
@@ -81,11 +104,13 @@ def ensure_test_user():
         print(f"Failed to ensure test user: {e}")
 
 
-@app.on_event("startup")
 def ensure_demo_db_seeded():
     """
     Ensure the AGENT database exists and is seeded with sample data if a seed file is available.
-    This is idempotent and safe to run on startup in development environments.
+    This is idempotent: the seed runs in a single transaction and is skipped when its checksum
+    matches the one recorded in the target DB.
+    Missing configuration or seed file is a skip; connection and seed errors are raised so
+    the warmup retries this step with backoff.
     """
     import os
     from urllib.parse import urlparse
@@ -107,8 +132,7 @@ def ensure_demo_db_seeded():
         admin_url = os.getenv('DATABASE_URL')
         admin_conn = get_db_connection(admin_url)
         if not admin_conn:
-            print('Failed to connect to admin DATABASE_URL; skipping demo DB creation')
-            return
+            raise ConnectionError('Failed to connect to admin DATABASE_URL for demo DB creation')
 
         cur = admin_conn.cursor()
         cur.execute("SELECT 1 FROM pg_database WHERE datname=%s", (target_db,))
@@ -154,32 +178,31 @@ def ensure_demo_db_seeded():
             print(f'Seed file not found at {seed_path}; skipping seeding')
             return
 
-        # Read SQL and execute statements sequentially
-        with open(seed_path, 'r', encoding='utf-8') as f:
-            sql = f.read()
-
-        # Split on semicolons to run statements one by one (simple but adequate for our seed)
-        statements = [s.strip() for s in sql.split(';') if s.strip()]
-
-        target_conn = get_db_connection(agent_db_url)
-        if not target_conn:
-            print(f'Failed to connect to target DB {agent_db_url}; skipping seeding')
+        # Apply the seed in one transaction; unchanged seeds (same checksum) are skipped
+        from app.services.seeding import seed_database
+        outcome = seed_database(agent_db_url, seed_path)
+        if outcome == "skipped":
+            print(f'Demo DB {target_db} already seeded with this seed file; skipping')
             return
+        print(f'Seeded demo DB: {target_db}')
 
-        tcur = target_conn.cursor()
-        for stmt in statements:
-            try:
-                tcur.execute(stmt)
-            except Exception as e:
-                # Log and continue
-                print(f'Error executing statement during seeding: {e}')
-        target_conn.commit()
-        tcur.close()
-        target_conn.close()
-        print(f'Seeded demo DB: {target_db} (statements executed: {len(statements)})')
+        # Seeded data changed, so cached results for this DB are stale
+        if AGENT_AVAILABLE:
+            invalidate_results(agent_db_url)
 
     except Exception as e:
-        print(f'Unexpected error during demo DB seeding: {e}')
+        print(f'Demo DB seeding failed: {e}')
+        raise
+
+@app.on_event("startup")
+def start_background_warmup():
+    """
+    Seeds the demo DB and preloads the agent (graph, embedding model, Chroma) in a
+    background thread, so the server accepts connections right away. /readyz reports progress.
+    """
+    metrics.observe("startup.import", _IMPORT_READY - _IMPORT_STARTED)
+    # Without agent dependencies only the seed step runs, but /readyz still waits for it
+    runtime.start_warmup(extra_steps=[("demo_db_seed", ensure_demo_db_seeded)], include_agent=AGENT_AVAILABLE)
 
 # --- CORS Configuration ---
 app.add_middleware(
@@ -201,12 +224,43 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 class QueryRequest(BaseModel):
     question: str
     data_source_id: Optional[int] = None  # Optional: User can specify which schema to use
+    session_id: Optional[str] = None  # Optional: reuse the previous turn of this conversation for follow-ups
 
 class QueryResponse(BaseModel):
     sql_query: str
     results: list
     summary: str
     status: str
+    query_id: Optional[int] = None  # Pass to /query/{query_id}/export for the full result
+    session_id: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    data_source_id: Optional[int] = None
+    stream: bool = False  # True: NDJSON, one line per question as it finishes
+
+class BatchQueryItem(BaseModel):
+    index: int
+    question: str
+    sql_query: str
+    results: list
+    summary: str
+    status: str
+    error: Optional[str] = None
+    elapsed_ms: float
+    duplicate_of: Optional[int] = None  # Set when the answer was reused from an identical question
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem]
+    unique_questions: int
+    elapsed_ms: float
+
+# Batch limits: questions per request and agent graphs run concurrently per batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# Largest page /data-sources will return
+DATA_SOURCES_MAX_PAGE = int(os.getenv("DATA_SOURCES_MAX_PAGE", "200"))
 
 # --- ENDPOINTS ---
 
@@ -214,6 +268,40 @@ class QueryResponse(BaseModel):
 async def root():
     return {"message": "AI Business Analyst API is running"}
 
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 once the warmup task has seeded the demo DB and loaded the agent
+    (or just seeded, when the agent isn't installed), 503 until then.
+    """
+    state = runtime.readiness()
+    state["import_seconds"] = round(_IMPORT_READY - _IMPORT_STARTED, 3)
+    code = 200 if state["status"] == "ready" else 503
+    return JSONResponse(status_code=code, content=state)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Returns in-process agent metrics: counters, per-tier latencies and routing stats.
+    """
+    snapshot = metrics.snapshot()
+    if AGENT_AVAILABLE:
+        snapshot["router"] = routing_stats()
+        snapshot["result_cache"] = result_cache.stats()
+        snapshot["admission"] = admission.stats()
+        snapshot["sessions"] = session_store.stats()
+    return snapshot
+
 # Note: We now use schemas.Token
 @app.post("/token", response_model=schemas.Token)
 async def login(
@@ -319,7 +407,7 @@ async def upload_schema(
             # services.parse_sql_blocks returns list of DDL blocks
             ddl_blocks = services.parse_sql_blocks(content_str)
             if ddl_blocks:
-                rag = VectorService()
+                rag = get_vector_service()
                 import re
                 for ddl in ddl_blocks:
                     m = re.search(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"]?([A-Za-z0-9_]+)[`\"]?', ddl, flags=re.IGNORECASE)
@@ -337,29 +425,109 @@ async def upload_schema(
 
 # --- QUERY ENDPOINTS ---
 
+def encode_cursor(created_at, source_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{source_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, source_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(source_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
 @app.get("/data-sources")
 async def list_data_sources(
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """
-    Returns all schemas uploaded by the current user.
+    Returns the current user's uploaded schemas, newest first, `limit` at a time.
+    When there are more, the `X-Next-Cursor` response header holds the `cursor`
+    value for the next page. Only a 200-character preview of each schema is read.
     """
-    sources = db.query(models.DataSource).filter(
+    limit = max(1, min(limit, DATA_SOURCES_MAX_PAGE))
+    query = db.query(
+        models.DataSource.id,
+        models.DataSource.filename,
+        models.DataSource.created_at,
+        func.substr(models.DataSource.schema_context, 1, 200).label("schema_preview")
+    ).filter(
         models.DataSource.user_id == current_user.id
-    ).all()
-    
+    )
+
+    # Keyset pagination on (created_at, id): served from ix_data_sources_user_id_created_at
+    # and as cheap on page 100 as on page 1, unlike OFFSET
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(models.DataSource.created_at, models.DataSource.id) < tuple_(created_at, last_id)
+        )
+
+    sources = query.order_by(
+        models.DataSource.created_at.desc(), models.DataSource.id.desc()
+    ).limit(limit + 1).all()
+
+    if len(sources) > limit:
+        sources = sources[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(sources[-1].created_at, sources[-1].id)
+
     return [
         {
             "id": source.id,
             "filename": source.filename,
             "created_at": source.created_at,
-            "schema_preview": source.schema_context[:200] + "..."  # Preview first 200 chars
+            "schema_preview": (source.schema_preview or "") + "..."  # Preview first 200 chars
         }
         for source in sources
     ]
 
 
+def parse_agent_result(result: dict) -> dict:
+    """
+    Extracts the SQL, parsed rows and summary from a finished agent state.
+    """
+    sql_query = result.get("sql_query", "")
+    query_result = result.get("query_result", "[]")
+    final_answer = result.get("final_answer", "")
+    
+    # Parse query results
+    try:
+        import ast
+        results = ast.literal_eval(query_result) if query_result != "[]" else []
+    except:
+        results = []
+    
+    return {"sql_query": sql_query, "results": results, "summary": final_answer}
+
+
+def save_query(db: Session, user_id: int, question: str, sql_query: str) -> Optional[int]:
+    """
+    Stores a generated query for export if it passes the same checks as the validator.
+    Returns its id, or None when there's nothing exportable.
+    """
+    from app.agents.sql_checks import check_sql
+
+    if not sql_query:
+        return None
+    clean_query, error = check_sql(sql_query)
+    if error:
+        return None
+
+    saved = models.SavedQuery(user_id=user_id, question=question, sql_query=clean_query)
+    db.add(saved)
+    db.commit()
+    db.refresh(saved)
+    return saved.id
+
+
 @app.post("/query", response_model=QueryResponse)
 async def process_query(
     query_request: QueryRequest,
@@ -377,8 +545,8 @@ async def process_query(
         )
     
     try:
-        # 1. Get the agent
-        agent = build_graph()
+        # 1. Get the agent (compiled once per process)
+        agent = runtime.get_agent()
         
         # 2. Build initial state
         initial_state = {
@@ -386,28 +554,42 @@ async def process_query(
             "retry_count": 0
         }
         
-        # 3. Run the agent workflow
-        result = agent.invoke(initial_state)
+        # Follow-up: start from the previous turn's schema context and SQL
+        session_id = query_request.session_id
+        if session_id:
+            history = session_store.get(current_user.id, session_id)
+            if history:
+                initial_state["history"] = history
+                metrics.incr("sessions.followups")
+        
+        # 3. Run the agent workflow, bounded by the global/per-user admission caps.
+        # The graph is blocking, so it runs in the threadpool instead of on the event loop.
+        async with admission.slot(current_user.id):
+            result = await run_in_threadpool(agent.invoke, initial_state)
         
         # 4. Parse results
-        sql_query = result.get("sql_query", "")
-        query_result = result.get("query_result", "[]")
-        final_answer = result.get("final_answer", "")
+        parsed = parse_agent_result(result)
+
+        # 5. Keep the validated SQL so the full result can be exported later
+        query_id = save_query(db, current_user.id, query_request.question, parsed["sql_query"])
         
-        # Parse query results
-        try:
-            import ast
-            results = ast.literal_eval(query_result) if query_result != "[]" else []
-        except:
-            results = []
+        # 6. Remember this turn for the next question in the session (only if it produced valid SQL)
+        if session_id and query_id:
+            session_store.put(current_user.id, session_id, {
+                "question": query_request.question,
+                "schema_context": result.get("schema_context", ""),
+                "sql_query": result.get("sql_query", ""),
+                "result_digest": result_digest(result.get("query_result", "")),
+            })
+        return QueryResponse(**parsed, status="success", query_id=query_id, session_id=session_id)
         
-        return QueryResponse(
-            sql_query=sql_query,
-            results=results,
-            summary=final_answer,
-            status="success"
+    except Overloaded as e:
+        # Shed load fast instead of letting latency collapse for everyone
+        raise HTTPException(
+            status_code=429,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -415,6 +597,174 @@ async def process_query(
         )
 
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def process_query_batch(
+    batch_request: BatchQueryRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Answers many questions in one call (e.g. a weekly KPI pack).
+    Identical questions are answered once, schema retrieval embeds all questions in a
+    single batched call, and up to BATCH_MAX_CONCURRENCY agent graphs run at once.
+    The batch takes one admission ticket that reserves that many global slots but
+    counts as a single run against the user's cap, so a batch is limited by its
+    slowest question rather than by ADMISSION_MAX_PER_USER.
+    """
+    if not AGENT_AVAILABLE:
+        raise HTTPException(
+            status_code=503, 
+            detail="Agent services not available. Please ensure agent dependencies are installed."
+        )
+    
+    questions = batch_request.questions
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions provided")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    
+    started = time.perf_counter()
+    
+    # 1. Dedupe: the first occurrence of each normalized question is the one we run
+    first_index = {}
+    duplicates = {}
+    for i, question in enumerate(questions):
+        # Whitespace only: case can matter inside literals ('Acme' vs 'ACME')
+        key = " ".join(question.split())
+        if key in first_index:
+            duplicates.setdefault(first_index[key], []).append(i)
+        else:
+            first_index[key] = i
+    unique_indexes = list(first_index.values())
+    
+    # 2. Admission: one ticket for the whole batch, holding one global slot per graph
+    # it may run at once. Shed the whole batch up front if the server is saturated.
+    width = max(1, min(BATCH_MAX_CONCURRENCY, len(unique_indexes)))
+    stack = AsyncExitStack()
+    try:
+        await stack.enter_async_context(admission.slot(current_user.id, weight=width))
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    
+    try:
+        # 3. Shared retrieval: one batched encode for every unique question
+        contexts = await run_in_threadpool(
+            get_vector_service().get_relevant_schemas, [questions[i] for i in unique_indexes], 3
+        )
+        agent = runtime.get_agent()
+    except Exception as e:
+        await stack.aclose()
+        raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
+    
+    # 4. The ticket's slots are handed out to graphs one per semaphore permit
+    semaphore = asyncio.Semaphore(width)
+    
+    async def run_one(index: int, context: str) -> list:
+        async with semaphore:
+            item_started = time.perf_counter()
+            initial_state = {"question": questions[index], "schema_context": context, "retry_count": 0}
+            try:
+                result = await run_in_threadpool(agent.invoke, initial_state)
+                item = {**parse_agent_result(result), "status": "success", "error": None}
+            except Exception as e:
+                item = {"sql_query": "", "results": [], "summary": "", "status": "error", "error": str(e)}
+            item["elapsed_ms"] = round((time.perf_counter() - item_started) * 1000, 1)
+        
+        items = [BatchQueryItem(index=index, question=questions[index], **item)]
+        items += [
+            BatchQueryItem(index=dup, question=questions[dup], duplicate_of=index, **item)
+            for dup in duplicates.get(index, [])
+        ]
+        return items
+    
+    if batch_request.stream:
+        async def stream_results():
+            # Tasks start with the body, so a client that never reads it costs nothing
+            tasks = [asyncio.create_task(run_one(i, c)) for i, c in zip(unique_indexes, contexts)]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    for item in await finished:
+                        yield json.dumps(item.model_dump()) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # The ticket is held until the last line is sent (or the client leaves)
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await ticket.aclose()
+        
+        ticket = stack.pop_all()
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    async with stack:
+        batches = await asyncio.gather(*(run_one(i, c) for i, c in zip(unique_indexes, contexts)))
+    
+    results = sorted((item for items in batches for item in items), key=lambda item: item.index)
+    return BatchQueryResponse(
+        results=results,
+        unique_questions=len(unique_indexes),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
+
+
+@app.get("/query/{query_id}/export")
+async def export_query(
+    query_id: int,
+    format: str = "csv",
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Re-runs a query from a previous /query call and streams the full result as
+    CSV, Arrow IPC (`arrow`) or Parquet. Rows are read through a server-side cursor
+    in chunks, so memory stays flat however large the result is.
+    `limit` lowers the row cap; it can't raise it above EXPORT_MAX_ROWS.
+    """
+    if not AGENT_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Agent services not available.")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Choose one of {sorted(EXPORT_FORMATS)}")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
+    saved = db.query(models.SavedQuery).filter(
+        models.SavedQuery.id == query_id,
+        models.SavedQuery.user_id == current_user.id
+    ).first()
+    if not saved:
+        raise HTTPException(status_code=404, detail="Query not found")
+
+    # Re-validate in case the checks have tightened since the query was stored
+    from app.agents.sql_checks import check_sql
+    clean_query, error = check_sql(saved.sql_query)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    exporter, media_type, extension = EXPORT_FORMATS[format]
+    chunks = exporter(clean_query, db_url=os.getenv("AGENT_DATABASE_URL"), limit=limit)
+
+    # Pull the first chunk before sending headers so connection, SQL and
+    # missing-dependency errors still come back as a proper HTTP error
+    try:
+        first = await run_in_threadpool(next, chunks, b"")
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+    def body():
+        yield first
+        # Sync generator: Starlette iterates it in the threadpool
+        yield from chunks
+
+    metrics.incr(f"export.{format}")
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="query_{query_id}.{extension}"'}
+    )
+
+
 @app.post("/upload_data")
 async def upload_data(
     file: UploadFile = File(...),
@@ -463,12 +813,16 @@ async def upload_data(
         db.commit()
         db.refresh(new_source)
 
+        # Uploaded data may change what queries return; drop cached results
+        if AGENT_AVAILABLE:
+            invalidate_results()
+
         # If agent services available, index SQL DDL blocks into Chroma for RAG
         if file_ext == '.sql' and AGENT_AVAILABLE:
             try:
                 ddl_blocks = services.parse_sql_blocks(content_str)
                 if ddl_blocks:
-                    rag = VectorService()
+                    rag = get_vector_service()
                     import re
                     for ddl in ddl_blocks:
                         m = re.search(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"]?([A-Za-z0-9_]+)[`\"]?', ddl, flags=re.IGNORECASE)
@@ -487,4 +841,8 @@ async def upload_data(
         
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+# End of module import; startup benchmarks compare this against _IMPORT_STARTED
+_IMPORT_READY = time.perf_counter()
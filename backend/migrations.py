@@ -0,0 +1,49 @@
+from sqlalchemy import text
+
+# create_all only creates missing tables; it never adds indexes or columns to tables
+# that already exist. Changes to existing tables go here as numbered steps, applied
+# once each (in order) at startup and recorded in `schema_migrations`.
+# Every statement must be idempotent, since databases created after a step was added
+# already have its objects from create_all.
+MIGRATIONS = [
+    (1, "data_sources user indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_data_sources_user_id ON data_sources (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_data_sources_user_id_created_at ON data_sources (user_id, created_at, id)",
+    ]),
+]
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers don't migrate twice
+MIGRATION_LOCK_ID = 727364002
+
+
+def run_migrations(engine, metadata=None) -> list:
+    """
+    Creates missing tables from `metadata` (if given) and applies pending migrations,
+    all in one transaction under the advisory lock, so workers starting together
+    don't race each other's CREATE TABLEs. Returns the versions applied.
+    """
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        if metadata is not None:
+            metadata.create_all(bind=conn)
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+        for version, name, statements in MIGRATIONS:
+            if version in done:
+                continue
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name}
+            )
+            applied.append(version)
+            print(f"Applied migration {version}: {name}")
+    return applied
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from db import Base
 
@@ -16,7 +17,24 @@ class DataSource(Base):
     __tablename__ = "data_sources"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id")) # Link to your User model
+    user_id = Column(Integer, ForeignKey("users.id"), index=True) # Link to your User model
     filename = Column(String)
-    schema_context = Column(Text, nullable=False) # <--- The important part
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # Deferred: can be megabytes per upload, so it's only loaded when actually accessed
+    schema_context = deferred(Column(Text, nullable=False)) # <--- The important part
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Keyset pagination of a user's uploads (see /data-sources). Existing databases
+    # get these indexes from migrations.py, since create_all doesn't touch existing tables.
+    __table_args__ = (
+        Index("ix_data_sources_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+class SavedQuery(Base):
+    __tablename__ = "saved_queries"
+
+    # Validated SQL from a /query run, so the full result can be exported later by id
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    question = Column(Text)
+    sql_query = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())